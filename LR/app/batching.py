@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+OK = "ok"
+REJECTED = "rejected"  # сообщение отклонено проверкой (ValueError)
+FAILED = "failed"  # непредвиденная ошибка
+
+
+# настройки, счётчик скорости и состояние таймера - дробить класс незачем
+class MessageBatcher:  # pylint: disable=too-many-instance-attributes
+    """Копит сообщения и отдаёт их обработчику пачками:
+    по max_size штук или не реже чем раз в max_wait секунд"""
+
+    def __init__(
+        self,
+        handle_batch: Callable[[list], Awaitable[None]],
+        max_size: int = 100,
+        max_wait: float = 0.05,
+        name: str = "batch",
+    ):
+        self.handle_batch = handle_batch
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.name = name
+        self.processed = 0
+        self._pending: list = []
+        self._timer: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self._started: float | None = None
+
+    async def add(self, item: Any) -> None:
+        if self._started is None:
+            self._started = time.perf_counter()
+        self._pending.append(item)
+        if len(self._pending) >= self.max_size:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.max_wait)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            started = time.perf_counter()
+            await self.handle_batch(batch)
+            self.processed += len(batch)
+            now = time.perf_counter()
+            logging.info(
+                "%s: %d messages in %.3f s, %.0f msg/s since start",
+                self.name,
+                len(batch),
+                now - started,
+                self.processed / (now - self._started),
+            )
+
+
+async def apply_batch(
+    engine: AsyncEngine,
+    bodies: list[dict],
+    apply: Callable[[AsyncSession, dict], Awaitable[Any]],
+) -> list[str]:
+    """Применить сообщения в одной транзакции БД.
+
+    commit() внутри репозиториев не фиксирует внешнюю транзакцию, и вся
+    пачка фиксируется одним COMMIT. Если какое-то сообщение упало, пачка
+    откатывается и повторяется с точкой сохранения на каждое сообщение,
+    чтобы ошибка откатывала только его.
+    Возвращает результат для каждого сообщения: OK, REJECTED или FAILED.
+    """
+    try:
+        return await _apply(engine, bodies, apply, savepoints=False)
+    except Exception:  # pylint: disable=broad-except
+        return await _apply(engine, bodies, apply, savepoints=True)
+
+
+async def _apply(engine, bodies, apply, savepoints: bool) -> list[str]:
+    outcomes = []
+    async with engine.connect() as conn:
+        await conn.begin()
+        session = AsyncSession(
+            bind=conn,
+            join_transaction_mode="create_savepoint" if savepoints else "rollback_only",
+            expire_on_commit=False,
+        )
+        try:
+            for body in bodies:
+                try:
+                    await apply(session, body)
+                    await session.commit()
+                    outcomes.append(OK)
+                except ValueError as e:
+                    if not savepoints:
+                        raise
+                    await session.rollback()
+                    logging.warning("Message rejected: %s", e)
+                    outcomes.append(REJECTED)
+                except Exception as e:  # pylint: disable=broad-except
+                    if not savepoints:
+                        raise
+                    await session.rollback()
+                    logging.exception("Error processing message: %s", e)
+                    outcomes.append(FAILED)
+        finally:
+            await session.close()
+        await conn.commit()
+    return outcomes
@@ -1,5 +1,435 @@
-import redis
+import asyncio
+import logging
+import math
+import os
+import random
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
 
-redis_client = redis.Redis(
-    host="redis", port=6379, decode_responses=True  # имя сервиса из docker-compose
+from redis.asyncio import BlockingConnectionPool, Redis
+
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")  # имя сервиса из docker-compose
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "100"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", "1024"))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", "30"))
+LIST_CACHE_TTL = int(os.getenv("LIST_CACHE_TTL", "60"))
+ORDER_CACHE_TTL = int(os.getenv("ORDER_CACHE_TTL", "300"))
+# коэффициент beta раннего обновления ключей (XFetch), 0 - выключено
+CACHE_EARLY_REFRESH = float(os.getenv("CACHE_EARLY_REFRESH", "0"))
+# что делать с ключом при изменении записи: "invalidate" - удалить,
+# "write-through" - сразу записать новое значение
+WRITE_THROUGH = "write-through"
+CACHE_WRITE_MODE = os.getenv("CACHE_WRITE_MODE", "invalidate")
+# сколько живёт версия ключа: должно быть дольше загрузки значения из БД
+CACHE_VERSION_TTL = 3600
+
+# Канал, через который процессы сообщают друг другу об изменённых ключах
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Общий пул соединений: при нехватке соединений запрос ждёт свободное,
+# а не падает с ошибкой
+redis_pool = BlockingConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    decode_responses=True,
 )
+
+redis_client = Redis(connection_pool=redis_pool)
+
+# Каждая запись в ключ (изменение, удаление) увеличивает его версию {key}:v.
+# Значение, загруженное из БД при промахе, записывается, только если версия
+# не изменилась с момента до чтения из БД: медленный читатель не затрёт
+# более новое значение.
+_fill_script = redis_client.register_script("""
+    if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then return 0 end
+    redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[2])
+    return 1
+    """)
+
+
+# То же для страниц списков: страница записывается и добавляется в тег,
+# только если версия тега не изменилась с момента до чтения из БД.
+_page_fill_script = redis_client.register_script("""
+    if (redis.call('GET', KEYS[3]) or '0') ~= ARGV[1] then return 0 end
+    redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[2])
+    redis.call('SADD', KEYS[2], KEYS[1])
+    redis.call('EXPIRE', KEYS[2], ARGV[2])
+    return 1
+    """)
+
+# Версия строки в БД (столбец version), последней записанной в ключ
+# write-through. Новое значение записывается, только если его версия больше:
+# так значение более ранней транзакции, чей сброс в Redis опоздал, не
+# затрёт значение более поздней. Удаление ключа записывается всегда.
+_write_script = redis_client.register_script("""
+    local newer = tonumber(ARGV[1]) > tonumber(redis.call('GET', KEYS[2]) or '0')
+    if newer then redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2]) end
+    if ARGV[4] == nil then
+        redis.call('UNLINK', KEYS[1])
+    elseif newer then
+        redis.call('SET', KEYS[1], ARGV[4], 'EX', ARGV[3])
+    end
+    return newer and 1 or 0
+    """)
+
+# версия удалённой строки: больше любой версии, с которой она записывалась
+DELETED_VERSION = 2**53
+
+
+def version_key(key: str) -> str:
+    return f"{key}:v"
+
+
+def row_version_key(key: str) -> str:
+    return f"{key}:rv"
+
+
+async def fill_cache(
+    redis: Redis, key: str, version: str | None, ttl: int, value: str
+) -> Any:
+    """Записать загруженное из БД значение, если ключ не менялся с тех пор,
+    как была прочитана его версия version. В конвейере - поставить в очередь"""
+    return await _fill_script(
+        keys=[key, version_key(key)], args=[version or "0", ttl, value], client=redis
+    )
+
+
+class LocalCache:
+    """LRU-кэш в памяти процесса (L1) с ограничением по размеру и TTL"""
+
+    def __init__(self, maxsize: int = LOCAL_CACHE_SIZE, ttl: float = LOCAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class CacheStats:
+    """Счётчики попаданий в кэш Redis на уровне процесса"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self) -> None:
+        self.hits += 1
+
+    def miss(self) -> None:
+        self.misses += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class SingleFlight:
+    """Одна загрузка на ключ в процессе: параллельные промахи по ключу
+    ждут уже идущую загрузку, а не запускают свою.
+
+    early_refresh - коэффициент beta раннего обновления (XFetch): ключ
+    обновляется до истечения с вероятностью, растущей по мере приближения
+    к истечению и с длительностью загрузки. 0 - выключено.
+    """
+
+    def __init__(self, early_refresh: float = CACHE_EARLY_REFRESH):
+        self.early_refresh = early_refresh
+        self.loads = 0
+        self.coalesced = 0
+        self.load_time = 0.0  # длительность последней загрузки, с
+        self._flights: dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._flights.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._timed(load))
+            self._flights[key] = future
+            future.add_done_callback(lambda _: self._flights.pop(key, None))
+            self.loads += 1
+        else:
+            self.coalesced += 1
+        # отмена одного ожидающего не должна отменять загрузку для остальных
+        return await asyncio.shield(future)
+
+    async def _timed(self, load: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            return await load()
+        finally:
+            self.load_time = time.perf_counter() - started
+
+    def refresh_early(self, ttl_left: float) -> bool:
+        """Пора ли обновить ключ, которому осталось жить ttl_left секунд"""
+        if self.early_refresh <= 0 or ttl_left < 0:
+            return False
+        rand = -math.log(1.0 - random.random())
+        return self.load_time * self.early_refresh * rand >= ttl_left
+
+    def stats(self) -> dict:
+        return {
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._flights),
+        }
+
+
+async def get_with_ttl(redis: Redis, key: str) -> tuple[str | None, float]:
+    """Значение ключа и оставшееся время жизни (с) за один запрос к Redis"""
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.get(key)
+        pipe.pttl(key)
+        value, ttl = await pipe.execute()
+    return value, ttl / 1000
+
+
+order_cache_stats = CacheStats()
+
+user_local_cache = LocalCache()
+product_local_cache = LocalCache()
+local_caches = (user_local_cache, product_local_cache)
+
+user_flight = SingleFlight()
+product_flight = SingleFlight()
+
+
+class ListCache:
+    """Кэш страниц списков в Redis в виде готового JSON.
+
+    Ключи страниц собираются в множество тега (tag:products и т.п.),
+    CacheWriteBuffer.invalidate_lists() удаляет все страницы тега разом.
+    """
+
+    def __init__(self, redis: Redis, tag: str, ttl: int = LIST_CACHE_TTL):
+        self.redis = redis
+        self.tag = tag
+        self.ttl = ttl
+
+    def key(self, **params) -> str:
+        query = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+        return f"list:{self.tag}:{query}"
+
+    async def get_or_load(
+        self,
+        load: Callable[[], Awaitable[tuple[bytes, str | None]]],
+        **params,
+    ) -> tuple[bytes, str | None]:
+        """Страница (JSON, курсор) из кэша, иначе load() с сохранением"""
+        key = self.key(**params)
+        tag_key = f"tag:{self.tag}"
+        # версия тега читается до загрузки, как у ключей записей
+        cached, version = await self.redis.mget(key, version_key(tag_key))
+        if cached is not None:
+            cursor, _, body = cached.partition("\n")
+            return body.encode(), cursor or None
+
+        body, cursor = await load()
+        await _page_fill_script(
+            keys=[key, tag_key, version_key(tag_key)],
+            # курсор - первой строкой, base64 не содержит перевода строки
+            args=[version or "0", self.ttl, f"{cursor or ''}\n{body.decode()}"],
+            client=self.redis,
+        )
+        return body, cursor
+
+
+class CacheWriteBuffer:
+    """Записи в кэш, собранные за запрос или пачку сообщений.
+
+    flush() вызывается после COMMIT и отправляет всё одним конвейером Redis:
+    INCR версий изменённых ключей, UNLINK удалённых ключей и страниц списков,
+    SETEX новых значений, PUBLISH в канал инвалидации. До COMMIT в кэш ничего
+    не пишется, поэтому туда не попадают данные незафиксированной транзакции.
+    Записи с версией строки (version) идут через _write_script.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self._sets: dict[str, tuple[int, str, int | None]] = {}
+        self._drop: dict[str, int | None] = {}
+        self._tags: set[str] = set()
+        self._local: dict[str, LocalCache] = {}
+
+    def set(
+        self,
+        key: str,
+        ttl: int,
+        value: str,
+        local_cache: LocalCache | None = None,
+        version: int | None = None,
+    ) -> None:
+        """Записать новое значение ключа (write-through); version - версия
+        зафиксированной строки, без неё запись безусловная"""
+        self._drop.pop(key, None)
+        self._sets[key] = (ttl, value, version)
+        if local_cache is not None:
+            self._local[key] = local_cache
+
+    def invalidate(
+        self,
+        key: str,
+        local_cache: LocalCache | None = None,
+        version: int | None = None,
+    ) -> None:
+        """Удалить ключ из Redis и L1 всех процессов; с version - ещё и
+        отклонить запоздавшие записи более старых версий строки"""
+        self._sets.pop(key, None)
+        self._drop[key] = version
+        if local_cache is not None:
+            self._local[key] = local_cache
+
+    def invalidate_lists(self, *tags: str) -> None:
+        """Удалить страницы списков с этими тегами"""
+        self._tags.update(tags)
+
+    def merge_into(self, target: "CacheWriteBuffer") -> None:
+        """Повторить записи этого буфера в target, будто они сделаны там"""
+        for key, version in self._drop.items():
+            target.invalidate(key, self._local.get(key), version)
+        for key, (ttl, value, version) in self._sets.items():
+            target.set(key, ttl, value, self._local.get(key), version)
+        target.invalidate_lists(*self._tags)
+
+    async def flush(self) -> None:
+        sets, drop, tags, local = self._sets, self._drop, self._tags, self._local
+        self._sets, self._drop, self._tags, self._local = {}, {}, set(), {}
+        if not (sets or drop or tags):
+            return
+        tag_keys = [f"tag:{tag}" for tag in sorted(tags)]
+        pages = await self._bump_tags(tag_keys) if tag_keys else []
+        unlink = [key for key, version in drop.items() if version is None]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in (*drop, *sets):
+                pipe.incr(version_key(key))
+                pipe.expire(version_key(key), CACHE_VERSION_TTL)
+            if unlink or tag_keys:
+                pipe.unlink(*unlink, *tag_keys, *pages)
+            for key, version in drop.items():
+                if version is not None:
+                    await self._write(pipe, key, version)
+            for key, (ttl, value, version) in sets.items():
+                if version is None:
+                    pipe.setex(key, ttl, value)
+                else:
+                    await self._write(pipe, key, version, ttl, value)
+            for key in (*drop, *sets):
+                pipe.publish(INVALIDATION_CHANNEL, key)
+            await pipe.execute()
+        for key, local_cache in local.items():
+            local_cache.pop(key)
+
+    async def _bump_tags(self, tag_keys: list[str]) -> list[str]:
+        """Увеличить версии тегов и получить ключи их страниц. Версии - до
+        SUNION: страница, добавленная в тег позже, уже не пройдёт проверку
+        версии, а добавленная раньше попадёт в SUNION и будет удалена"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for tag_key in tag_keys:
+                pipe.incr(version_key(tag_key))
+                pipe.expire(version_key(tag_key), CACHE_VERSION_TTL)
+            pipe.sunion(tag_keys)
+            *_, pages = await pipe.execute()
+        return list(pages)
+
+    @staticmethod
+    async def _write(pipe, key: str, version: int, *value) -> None:
+        """Поставить в очередь конвейера запись с проверкой версии строки"""
+        await _write_script(
+            keys=[key, row_version_key(key)],
+            args=[version, CACHE_VERSION_TTL, *value],
+            client=pipe,
+        )
+
+
+@asynccontextmanager
+async def cache_writes(
+    redis: Redis, buffer: CacheWriteBuffer | None = None
+) -> AsyncIterator[CacheWriteBuffer]:
+    """Общий буфер запроса или пачки (его сбросит владелец после своего
+    COMMIT), иначе свой, сбрасываемый на выходе из блока без ошибок"""
+    if buffer is not None:
+        yield buffer
+        return
+    buffer = CacheWriteBuffer(redis)
+    yield buffer
+    await buffer.flush()
+
+
+user_list_cache = ListCache(redis_client, "users")
+product_list_cache = ListCache(redis_client, "products")
+order_list_cache = ListCache(redis_client, "orders")
+
+
+async def listen_invalidations(redis: Redis) -> None:
+    """Слушать канал инвалидации и удалять ключи из L1 этого процесса"""
+    while True:
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # пока не были подписаны, сообщения могли потеряться
+            for cache in local_caches:
+                cache.clear()
+            async for message in pubsub.listen():
+                for cache in local_caches:
+                    cache.pop(message["data"])
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Cache invalidation listener failed, reconnecting")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
+_listeners: set[asyncio.Task] = set()
+
+
+async def start_invalidation_listener() -> None:
+    _listeners.add(asyncio.create_task(listen_invalidations(redis_client)))
+
+
+async def close_redis() -> None:
+    """Закрыть клиент и все соединения пула"""
+    while _listeners:
+        _listeners.pop().cancel()
+    await redis_client.aclose()
+    await redis_pool.disconnect()
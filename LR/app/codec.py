@@ -0,0 +1,103 @@
+import json
+import struct
+from abc import ABC, abstractmethod
+
+try:
+    import msgpack
+except ImportError:  # msgpack - необязательная зависимость
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ORDER_STRUCT = "application/x-order-create"
+
+
+class Codec(ABC):
+    """Кодирование сообщений очереди в байты и обратно"""
+
+    content_type: str
+
+    @abstractmethod
+    def encode(self, message: dict) -> bytes: ...
+
+    @abstractmethod
+    def decode(self, body: bytes) -> dict: ...
+
+
+class JsonCodec(Codec):
+    content_type = JSON
+
+    def encode(self, message: dict) -> bytes:
+        return json.dumps(message, separators=(",", ":")).encode()
+
+    def decode(self, body: bytes) -> dict:
+        return json.loads(body)
+
+
+class MsgpackCodec(Codec):
+    content_type = MSGPACK
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(message)
+
+    def decode(self, body: bytes) -> dict:
+        return msgpack.unpackb(body)
+
+
+class OrderStructCodec(Codec):
+    """Фиксированная схема для сообщения о создании заказа:
+    user_id, address_id (0 - нет), число позиций, затем пары
+    (product_id, quantity); все поля - uint32 little-endian"""
+
+    content_type = ORDER_STRUCT
+    header = struct.Struct("<III")
+
+    def encode(self, message: dict) -> bytes:
+        if message.get("action", "create") != "create":
+            raise ValueError("Only order create messages have a fixed schema")
+        items = message.get("items") or []
+        flat = [v for item in items for v in (item["product_id"], item["quantity"])]
+        try:
+            return self.header.pack(
+                message["user_id"], message.get("address_id") or 0, len(items)
+            ) + struct.pack(f"<{len(flat)}I", *flat)
+        except struct.error as e:
+            # отрицательные, слишком большие и пустые поля не влезают в uint32
+            raise ValueError(f"Order message does not fit the schema: {e}") from e
+
+    def decode(self, body: bytes) -> dict:
+        try:
+            user_id, address_id, count = self.header.unpack_from(body)
+            flat = struct.unpack_from(f"<{2 * count}I", body, self.header.size)
+        except struct.error as e:
+            raise ValueError(f"Malformed order message: {e}") from e
+        return {
+            "action": "create",
+            "user_id": user_id,
+            "address_id": address_id or None,
+            "items": [
+                {"product_id": flat[i], "quantity": flat[i + 1]}
+                for i in range(0, len(flat), 2)
+            ],
+        }
+
+
+codecs = {JSON: JsonCodec(), ORDER_STRUCT: OrderStructCodec()}
+if msgpack is not None:
+    codecs[MSGPACK] = MsgpackCodec()
+
+
+def get_codec(content_type: str | None) -> Codec:
+    """Кодек по content-type сообщения; без content-type - JSON"""
+    try:
+        return codecs[content_type or JSON]
+    except KeyError as e:
+        raise ValueError(f"Unsupported content type: {content_type}") from e
+
+
+def encode(message: dict, content_type: str = JSON) -> bytes:
+    return get_codec(content_type).encode(message)
+
+
+def decode(body: bytes, content_type: str | None = None) -> dict:
+    return get_codec(content_type).decode(body)
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class LaneExecutor:
+    """Обработка сообщений в `lanes` параллельных полосах.
+
+    Одновременно выполняется не больше `lanes` обработчиков. Сообщения с
+    одинаковым ключом попадают в одну полосу и обрабатываются строго по
+    порядку поступления.
+    """
+
+    def __init__(
+        self,
+        handle: Callable[[Any], Awaitable[None]],
+        lanes: int = 8,
+        name: str = "lanes",
+    ):
+        self.handle = handle
+        self.name = name
+        self._queues = [asyncio.Queue() for _ in range(lanes)]
+        self._tasks: list[asyncio.Task] = []
+
+    def lane(self, key: Hashable) -> int:
+        return hash(key) % len(self._queues)
+
+    async def submit(self, key: Hashable, item: Any) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._run(queue)) for queue in self._queues
+            ]
+        await self._queues[self.lane(key)].put(item)
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        while True:
+            item = await queue.get()
+            try:
+                await self.handle(item)
+            except Exception as e:  # pylint: disable=broad-except
+                logging.exception("%s: error processing message: %s", self.name, e)
+            finally:
+                queue.task_done()
+
+    async def join(self) -> None:
+        """Дождаться обработки всех принятых сообщений"""
+        await asyncio.gather(*(queue.join() for queue in self._queues))
+
+    async def close(self) -> None:
+        await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,30 @@
+from litestar import Controller, get
+from LR.app.cache import (
+    order_cache_stats,
+    product_flight,
+    product_local_cache,
+    user_flight,
+    user_local_cache,
+)
+from LR.app.database import pool_stats
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class MetricsController(Controller):
+    path = "/metrics"
+
+    @get()
+    async def get_metrics(self, db_engine: AsyncEngine) -> dict:
+        """Состояние пула соединений БД и кэшей"""
+        return {
+            "db_pool": pool_stats(db_engine),
+            "local_cache": {
+                "user": user_local_cache.stats(),
+                "product": product_local_cache.stats(),
+            },
+            "redis_cache": {"order": order_cache_stats.stats()},
+            "single_flight": {
+                "user": user_flight.stats(),
+                "product": product_flight.stats(),
+            },
+        }
@@ -1,8 +1,13 @@
 import logging
+from typing import Optional
 
-from litestar import Controller, Request, delete, get, post, put
+from litestar import Controller, MediaType, Request, Response, delete, get, post, put
 from litestar.exceptions import HTTPException, NotFoundException
 from litestar.params import Parameter
+from litestar.response import Stream
+from LR.app.ndjson import NDJSON, SessionFactory, ndjson_rows
+from LR.app.pagination import cursor_filters, cursor_headers
+from LR.app.repositories.order_repository import OrderRepository
 from LR.app.services.order_service import OrderService
 from LR.orm.model import OrderCreate, OrderResponse, OrderUpdate
 
@@ -15,17 +20,30 @@ class OrderController(Controller):
         "OrderResponse": OrderResponse,
     }
 
+    @get("/export")
+    async def export_orders(self, db_session_factory: SessionFactory) -> Stream:
+        """Выгрузить все заказы потоком NDJSON"""
+        return Stream(
+            ndjson_rows(
+                db_session_factory,
+                lambda session: OrderRepository(session).stream_all(),
+                OrderResponse,
+            ),
+            media_type=NDJSON,
+        )
+
     @get("/{order_id:int}")
     async def get_order_by_id(
         self,
         order_service: OrderService,
         order_id: int = Parameter(gt=0),
-    ) -> OrderResponse:
+    ) -> Response[OrderResponse]:
         """Получить заказ по ID"""
-        order = await order_service.get_by_id(order_id)
-        if not order:
+        # JSON из кэша отдаётся как есть, без разбора и повторной сериализации
+        body = await order_service.get_json_by_id(order_id)
+        if body is None:
             raise NotFoundException(detail=f"Order with ID {order_id} not found")
-        return OrderResponse.model_validate(order, from_attributes=True)
+        return Response(body, media_type=MediaType.JSON)
 
     @get("/u/{user_id:int}")
     async def get_user_orders(
@@ -34,16 +52,18 @@ class OrderController(Controller):
         user_id: int = Parameter(gt=0),
         count: int = 10,
         page: int = 1,
-    ) -> list[OrderResponse]:
-        """Получить все заказы пользователя(ID)"""
+        after: Optional[str] = None,
+    ) -> Response[list[OrderResponse]]:
+        """Получить все заказы пользователя(ID), after - курсор страницы"""
+        filters = cursor_filters(after)
         try:
-            orders = await order_service.get_by_filter(
-                user_id=user_id, count=count, page=page
+            # страница приходит готовым JSON (из кэша или БД)
+            body, cursor = await order_service.get_page(
+                user_id=user_id, count=count, page=page, **filters
+            )
+            return Response(
+                body, media_type=MediaType.JSON, headers=cursor_headers(cursor)
             )
-            return [
-                OrderResponse.model_validate(order, from_attributes=True)
-                for order in orders
-            ]
         except Exception as e:
             logging.exception("Error in get_user_orders")
             raise HTTPException(status_code=500, detail=str(e)) from e
@@ -54,14 +74,18 @@ class OrderController(Controller):
         order_service: OrderService,
         count: int = 10,
         page: int = 1,
-    ) -> list[OrderResponse]:
-        """Получить все заказы"""
+        after: Optional[str] = None,
+    ) -> Response[list[OrderResponse]]:
+        """Получить все заказы, after - курсор страницы (keyset)"""
+        filters = cursor_filters(after)
         try:
-            orders = await order_service.get_by_filter(count=count, page=page)
-            return [
-                OrderResponse.model_validate(order, from_attributes=True)
-                for order in orders
-            ]
+            # страница приходит готовым JSON (из кэша или БД)
+            body, cursor = await order_service.get_page(
+                count=count, page=page, **filters
+            )
+            return Response(
+                body, media_type=MediaType.JSON, headers=cursor_headers(cursor)
+            )
         except Exception as e:
             logging.exception("Error in get_all_orders")
             raise HTTPException(status_code=500, detail=str(e)) from e
@@ -1,9 +1,15 @@
 import logging
-from typing import List
+from collections import Counter
+from typing import Any, AsyncIterator, List, Optional
 
-from litestar import Controller, Request, delete, get, post, put
+from litestar import Controller, MediaType, Request, Response, delete, get, post, put
 from litestar.exceptions import HTTPException, NotFoundException
 from litestar.params import Parameter
+from litestar.response import Stream
+from litestar.status_codes import HTTP_200_OK
+from LR.app.ndjson import NDJSON, SessionFactory, ndjson_lines, ndjson_rows
+from LR.app.pagination import cursor_filters, cursor_headers, parse_ids
+from LR.app.repositories.product_repository import ProductRepository
 from LR.app.services.product_service import ProductService
 from LR.orm.model import ProductCreate, ProductResponse, ProductUpdate
 
@@ -16,17 +22,38 @@ class ProductController(Controller):
         "ProductResponse": ProductResponse,
     }
 
+    @get("/export")
+    async def export_products(self, db_session_factory: SessionFactory) -> Stream:
+        """Выгрузить все продукты потоком NDJSON"""
+        return Stream(
+            ndjson_rows(
+                db_session_factory,
+                lambda session: ProductRepository(session).stream_all(),
+                ProductResponse,
+            ),
+            media_type=NDJSON,
+        )
+
+    @get("/batch")
+    async def get_products_batch(
+        self, product_service: ProductService, ids: str
+    ) -> Response[List[ProductResponse]]:
+        """Получить продукты по списку ID: ?ids=1,2,3"""
+        body = await product_service.get_json_many(parse_ids(ids))
+        return Response(body, media_type=MediaType.JSON)
+
     @get("/{product_id:int}")
     async def get_product_by_id(
         self,
         product_service: ProductService,
         product_id: int = Parameter(gt=0),
-    ) -> ProductResponse:
+    ) -> Response[ProductResponse]:
         """Получить продукт по ID"""
-        product = await product_service.get_by_id(product_id)
-        if not product:
+        # JSON из кэша отдаётся как есть, без разбора и повторной сериализации
+        body = await product_service.get_json_by_id(product_id)
+        if body is None:
             raise NotFoundException(detail=f"Product with ID {product_id} not found")
-        return ProductResponse.model_validate(product, from_attributes=True)
+        return Response(body, media_type=MediaType.JSON)
 
     @get()
     async def get_all_products(
@@ -34,14 +61,22 @@ class ProductController(Controller):
         product_service: ProductService,
         count: int = 10,
         page: int = 1,
-    ) -> List[ProductResponse]:
-        """Получить все продукты"""
+        after: Optional[str] = None,
+    ) -> Response[List[ProductResponse]]:
+        """Получить все продукты
+
+        С параметром after - постраничный обход по курсору (keyset),
+        курсор следующей страницы приходит в заголовке X-Next-Cursor.
+        """
+        filters = cursor_filters(after)
         try:
-            products = await product_service.get_by_filter(count=count, page=page)
-            return [
-                ProductResponse.model_validate(product, from_attributes=True)
-                for product in products
-            ]
+            # страница приходит готовым JSON (из кэша или БД)
+            body, cursor = await product_service.get_page(
+                count=count, page=page, **filters
+            )
+            return Response(
+                body, media_type=MediaType.JSON, headers=cursor_headers(cursor)
+            )
         except Exception as e:
             logging.exception("Error in get_all_products")
             raise HTTPException(status_code=500, detail=str(e)) from e
@@ -66,6 +101,34 @@ class ProductController(Controller):
                 status_code=500, detail=f"Error creating product: {str(e)}"
             ) from e
 
+    @post("/bulk", status_code=HTTP_200_OK)
+    async def bulk_products(
+        self,
+        product_service: ProductService,
+        request: Request,
+        on_conflict: str = Parameter(default="skip", pattern="^(skip|update)$"),
+    ) -> dict:
+        """Создать продукты пачкой: JSON-массив или NDJSON (по продукту на строку)
+
+        on_conflict=update обновляет остаток продуктов с уже занятым названием.
+        В ответе - число строк по результату и результат каждой строки.
+        """
+        if request.content_type[0] == NDJSON:
+            # тело читается по частям, не целиком в память
+            rows = ndjson_lines(request.stream())
+        else:
+            data = await request.json()
+            if not isinstance(data, list):
+                raise HTTPException(status_code=400, detail="Expected a JSON array")
+            rows = _iterate(data)
+        results = await product_service.bulk_upsert(
+            rows, update=on_conflict == "update"
+        )
+        return {
+            **Counter(result["status"] for result in results),
+            "results": results,
+        }
+
     @put("/{product_id:int}")
     async def update_product(
         self,
@@ -97,3 +160,8 @@ class ProductController(Controller):
     ) -> None:
         """Удалить продукт"""
         return await product_service.delete(product_id)
+
+
+async def _iterate(items: list) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
@@ -1,9 +1,10 @@
 import logging
-from typing import List
+from typing import List, Optional
 
-from litestar import Controller, Request, delete, get, post, put
+from litestar import Controller, MediaType, Request, Response, delete, get, post, put
 from litestar.exceptions import HTTPException, NotFoundException
 from litestar.params import Parameter
+from LR.app.pagination import cursor_filters, cursor_headers, parse_ids
 from LR.app.services.user_service import UserService
 from LR.orm.model import UserCreate, UserResponse, UserUpdate
 
@@ -16,17 +17,26 @@ class UserController(Controller):
         "UserResponse": UserResponse,
     }
 
+    @get("/batch")
+    async def get_users_batch(
+        self, user_service: UserService, ids: str
+    ) -> Response[List[UserResponse]]:
+        """Получить пользователей по списку ID: ?ids=1,2,3"""
+        body = await user_service.get_json_many(parse_ids(ids))
+        return Response(body, media_type=MediaType.JSON)
+
     @get("/{user_id:int}")
     async def get_user_by_id(
         self,
         user_service: UserService,
         user_id: int = Parameter(gt=0),
-    ) -> UserResponse:
+    ) -> Response[UserResponse]:
         """Получить пользователя по ID"""
-        user = await user_service.get_by_id(user_id)
-        if not user:
+        # JSON из кэша отдаётся как есть, без разбора и повторной сериализации
+        body = await user_service.get_json_by_id(user_id)
+        if body is None:
             raise NotFoundException(detail=f"User with ID {user_id} not found")
-        return UserResponse.model_validate(user, from_attributes=True)
+        return Response(body, media_type=MediaType.JSON)
 
     @get()
     async def get_all_users(
@@ -34,14 +44,22 @@ class UserController(Controller):
         user_service: UserService,
         count: int = 10,
         page: int = 1,
-    ) -> List[UserResponse]:
-        """Получить всех пользователей"""
+        after: Optional[str] = None,
+    ) -> Response[List[UserResponse]]:
+        """Получить всех пользователей
+
+        С параметром after - постраничный обход по курсору (keyset),
+        курсор следующей страницы приходит в заголовке X-Next-Cursor.
+        """
+        filters = cursor_filters(after)
         try:
-            users = await user_service.get_by_filter(count=count, page=page)
-            return [
-                UserResponse.model_validate(user, from_attributes=True)
-                for user in users
-            ]
+            # страница приходит готовым JSON (из кэша или БД)
+            body, cursor = await user_service.get_page(
+                count=count, page=page, **filters
+            )
+            return Response(
+                body, media_type=MediaType.JSON, headers=cursor_headers(cursor)
+            )
         except Exception as e:
             logging.exception("Error in get_all_users")
             raise HTTPException(status_code=500, detail=str(e)) from e
@@ -112,5 +130,12 @@ class MainPage(Controller):
     /orders/[id заказа] - конкретный заказ
     /orders/u/[id пользователя] - заказы конкретного пользователя
 
+    /products/export, /orders/export - выгрузка всей таблицы в NDJSON
+
     /report?date=[год]-[месяц]-[день] - отчет по заказам
+
+    /metrics - состояние пула соединений БД и кэшей
+
+    ?after=&count=N - обход списков по курсору, следующий курсор
+                      приходит в заголовке X-Next-Cursor
 """
@@ -0,0 +1,41 @@
+from typing import AsyncIterator, Callable
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NDJSON = "application/x-ndjson"
+
+SessionFactory = Callable[[], AsyncSession]
+
+
+async def ndjson_rows(
+    session_factory: SessionFactory,
+    stream: Callable[[AsyncSession], AsyncIterator[list]],
+    model: type[BaseModel],
+) -> AsyncIterator[bytes]:
+    """Выгрузка таблицы построчно в NDJSON.
+
+    Сессия открывается внутри генератора: зависимость db_session
+    закрывается до того, как Stream начнёт отдавать тело ответа.
+    """
+    async with session_factory() as session:
+        async for chunk in stream(session):
+            yield b"".join(
+                model.model_validate(row, from_attributes=True)
+                .model_dump_json()
+                .encode()
+                + b"\n"
+                for row in chunk
+            )
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Непустые строки NDJSON из тела запроса, которое читается по частям"""
+    tail = b""
+    async for data in chunks:
+        *lines, tail = (tail + data).split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if tail.strip():
+        yield tail
@@ -0,0 +1,62 @@
+import base64
+
+from litestar.exceptions import HTTPException
+from pydantic import TypeAdapter
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+BATCH_MAX_IDS = 100  # сколько id можно запросить одним ?ids=
+
+
+def encode_cursor(last_id: int) -> str:
+    """Непрозрачный курсор из id последней записи страницы"""
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    if not cursor:  # пустой ?after= - первая страница в режиме курсора
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, last_id = base64.urlsafe_b64decode(padded).decode().split(":")
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(last_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+def cursor_filters(after: str | None) -> dict:
+    """Параметры для get_by_filter: пусто в режиме страниц (page)"""
+    return {} if after is None else {"after": decode_cursor(after)}
+
+
+def parse_ids(ids: str) -> list[int]:
+    """Список id из ?ids=1,2,3 без повторов, в порядке запроса"""
+    try:
+        parsed = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid ids") from e
+    if not parsed or len(parsed) > BATCH_MAX_IDS or min(parsed) <= 0:
+        raise HTTPException(
+            status_code=400, detail=f"Expected 1 to {BATCH_MAX_IDS} positive ids"
+        )
+    return parsed
+
+
+def next_cursor(rows: list, count: int) -> str | None:
+    """Курсор следующей страницы, если она может быть"""
+    if count <= 0 or len(rows) < count:
+        return None
+    return encode_cursor(rows[-1].id)
+
+
+def cursor_headers(cursor: str | None) -> dict[str, str] | None:
+    return {NEXT_CURSOR_HEADER: cursor} if cursor else None
+
+
+def page_json(
+    adapter: TypeAdapter, rows: list, count: int, keyset: bool
+) -> tuple[bytes, str | None]:
+    """Страница списка готовым JSON и курсор следующей (в режиме курсора)"""
+    body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    return body, next_cursor(rows, count) if keyset else None
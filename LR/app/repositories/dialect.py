@@ -0,0 +1,4 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+# INSERT ... ON CONFLICT есть только в диалектных insert()
+DIALECT_INSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
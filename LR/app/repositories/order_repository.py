@@ -1,25 +1,48 @@
+from datetime import date
+from typing import AsyncIterator
+
+from LR.app.repositories.report_repository import ReportRepository
 from LR.orm.db import Order, OrderItem
-from LR.orm.model import OrderCreate, OrderUpdate
-from sqlalchemy import select
+from LR.orm.model import (
+    OrderCreate,
+    OrderItemResponse,
+    OrderResponse,
+    OrderUpdate,
+)
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 
 class OrderRepository:
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        report_repository: ReportRepository | None = None,
+    ):
         self.session = session
+        # если задан - строка заказа в отчёте за сегодня ведётся сразу
+        self.report_repository = report_repository
 
-    async def get_by_id(self, order_id: int) -> Order | None:
+    async def get_by_id(self, order_id: int, for_update: bool = False) -> Order | None:
         query = (
             select(Order)
             .options(selectinload(Order.items).selectinload(OrderItem.product))
             .where(Order.id == order_id)
         )
+        if for_update:
+            # строка заказа блокируется до конца транзакции: позиции
+            # читаются заново, а не из сессии
+            query = query.with_for_update().execution_options(populate_existing=True)
         result = await self.session.execute(query)
         return result.scalars().one_or_none()
 
     async def get_by_filter(
-        self, count: int | None = None, page: int | None = None, **kwargs
+        self,
+        count: int | None = None,
+        page: int | None = None,
+        after: int | None = None,
+        **kwargs,
     ) -> list[Order]:
         query = select(Order).options(
             selectinload(Order.items).selectinload(OrderItem.product)
@@ -29,35 +52,73 @@ class OrderRepository:
                 if hasattr(Order, key) and value is not None:
                     query = query.where(getattr(Order, key) == value)
 
-        if count is not None and page is not None:
+        if after is not None:
+            # keyset: сразу к нужному месту по индексу первичного ключа
+            query = query.where(Order.id > after).order_by(Order.id)
+            if count is not None:
+                query = query.limit(count)
+        elif count is not None and page is not None:
             offset = (page - 1) * count
             query = query.offset(offset).limit(count)
 
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
-    async def create(self, order_data: OrderCreate) -> Order:
-        # сам заказ
-        order = Order(
-            user_id=order_data.user_id,
-            address_id=order_data.address_id,
+    async def stream_all(self, chunk_size: int = 1000) -> AsyncIterator[list[Order]]:
+        """Все заказы с позициями пачками через серверный курсор"""
+        query = (
+            select(Order)
+            .options(selectinload(Order.items))
+            .order_by(Order.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await self.session.stream_scalars(query)
+        async for chunk in result.partitions():
+            yield chunk
+
+    async def create(self, order_data: OrderCreate) -> OrderResponse:
+        # сам заказ: id возвращается тем же INSERT ... RETURNING
+        result = await self.session.execute(
+            insert(Order)
+            .values(user_id=order_data.user_id, address_id=order_data.address_id)
+            .returning(Order.id)
         )
-        self.session.add(order)
-        await self.session.flush()  # получаем id заказа
+        order_id = result.scalar_one()
 
-        # позиции заказа
-        for item in order_data.items:
-            order_item = OrderItem(
-                order_id=order.id, product_id=item.product_id, quantity=item.quantity
+        # позиции заказа одним многострочным INSERT
+        items = []
+        if order_data.items:
+            result = await self.session.execute(
+                insert(OrderItem).returning(
+                    OrderItem.id,
+                    OrderItem.product_id,
+                    OrderItem.quantity,
+                ),
+                [
+                    {
+                        "order_id": order_id,
+                        "product_id": item.product_id,
+                        "quantity": item.quantity,
+                    }
+                    for item in order_data.items
+                ],
             )
-            self.session.add(order_item)
+            items = [
+                OrderItemResponse(
+                    id=row.id, product_id=row.product_id, quantity=row.quantity
+                )
+                for row in sorted(result, key=lambda row: row.id)
+            ]
 
+        await self._refresh_report(order_id)
         await self.session.commit()  # фиксируем изменения
-        query = (
-            select(Order).options(selectinload(Order.items)).where(Order.id == order.id)
+        # ответ собираем из RETURNING, без повторного SELECT
+        return OrderResponse(
+            id=order_id,
+            user_id=order_data.user_id,
+            address_id=order_data.address_id,
+            items=items,
         )
-        result = await self.session.execute(query)
-        return result.scalars().one()
 
     async def update(self, order_id: int, order_data: OrderUpdate) -> Order:
         order = await self.get_by_id(order_id)
@@ -72,11 +133,11 @@ class OrderRepository:
 
         # если пришёл список items — обновляем их
         if "items" in update_data:
-            for item_update in update_data["items"]:
+            for item_update in order_data.items:
                 if item_update.id:  # обновляем существующую позицию
                     item = await self.session.get(OrderItem, item_update.id)
                     if item and item.order_id == order.id:
-                        upd = item_update.model_dump(exclude_unset=True)
+                        upd = item_update.model_dump(exclude_unset=True, exclude={"id"})
                         for k, v in upd.items():
                             setattr(item, k, v)
                 else:  # добавляем новую позицию
@@ -87,6 +148,7 @@ class OrderRepository:
                     )
                     self.session.add(new_item)
 
+        await self._refresh_report(order.id)
         await self.session.commit()
         query = (
             select(Order).options(selectinload(Order.items)).where(Order.id == order.id)
@@ -94,6 +156,10 @@ class OrderRepository:
         result = await self.session.execute(query)
         return result.scalars().one()
 
+    async def _refresh_report(self, order_id: int) -> None:
+        if self.report_repository is not None:
+            await self.report_repository.refresh_order(order_id, date.today())
+
     async def delete(self, order_id: int) -> None:
         order = await self.get_by_id(order_id)
         if order:
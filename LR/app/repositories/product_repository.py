@@ -1,6 +1,10 @@
+from typing import AsyncIterator
+
+from LR.app.repositories.dialect import DIALECT_INSERT
 from LR.orm.db import Product
 from LR.orm.model import ProductCreate, ProductUpdate
-from sqlalchemy import select
+from sqlalchemy import literal_column, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -13,8 +17,29 @@ class ProductRepository:
         result = await self.session.execute(query)
         return result.scalars().one_or_none()
 
+    async def get_many(
+        self, product_ids: list[int], for_update: bool = False
+    ) -> list[Product]:
+        if not product_ids:
+            return []
+        query = select(Product).where(Product.id.in_(product_ids))
+        if for_update:
+            # строки блокируются по возрастанию id - параллельные заказы
+            # берут блокировки в одном порядке и не могут взаимоблокироваться
+            query = (
+                query.order_by(Product.id)
+                .with_for_update()
+                .execution_options(populate_existing=True)
+            )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
     async def get_by_filter(
-        self, count: int | None = None, page: int | None = None, **kwargs
+        self,
+        count: int | None = None,
+        page: int | None = None,
+        after: int | None = None,
+        **kwargs,
     ) -> list[Product]:
         query = select(Product)
         if kwargs:
@@ -22,34 +47,124 @@ class ProductRepository:
                 if hasattr(Product, key) and value is not None:
                     query = query.where(getattr(Product, key) == value)
 
-        if count is not None and page is not None:
+        if after is not None:
+            # keyset: сразу к нужному месту по индексу первичного ключа
+            query = query.where(Product.id > after).order_by(Product.id)
+            if count is not None:
+                query = query.limit(count)
+        elif count is not None and page is not None:
             offset = (page - 1) * count
             query = query.offset(offset).limit(count)
 
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
-    async def create(self, product_data: ProductCreate) -> Product:
-        product = Product(
-            product_name=product_data.product_name, quantity=product_data.quantity
+    def reserve(self, product: Product, quantity: int) -> int:
+        """Списать остаток товара; UPDATE уйдёт при фиксации заказа.
+        Возвращает новую версию строки (строка заблокирована get_many)"""
+        version = product.version + 1
+        product.quantity = Product.quantity - quantity
+        product.version = Product.version + 1
+        return version
+
+    async def stream_all(self, chunk_size: int = 1000) -> AsyncIterator[list[Product]]:
+        """Все продукты пачками через серверный курсор"""
+        query = (
+            select(Product).order_by(Product.id).execution_options(yield_per=chunk_size)
+        )
+        result = await self.session.stream_scalars(query)
+        async for chunk in result.partitions():
+            yield chunk
+
+    async def get_ids_by_names(self, names: list[str]) -> dict[str, int]:
+        """id продуктов по названиям одним запросом WHERE product_name IN"""
+        if not names:
+            return {}
+        query = select(Product.product_name, Product.id).where(
+            Product.product_name.in_(names)
+        )
+        result = await self.session.execute(query)
+        return dict(result.all())
+
+    async def insert_many(
+        self, rows: list[dict], update: bool = False
+    ) -> dict[str, tuple[int, bool, int]]:
+        """Многострочный INSERT ... ON CONFLICT (product_name): продукт с
+        занятым названием пропускается, с update=True - получает новый остаток.
+        Возвращает (id, создана ли строка, версия) записанных строк по названию"""
+        if not rows:
+            return {}
+        dialect = self.session.get_bind().dialect.name
+        query = DIALECT_INSERT[dialect](Product).values(rows)
+        columns = [Product.product_name, Product.id, Product.version]
+        existing: dict[str, int] = {}
+        if not update:
+            query = query.on_conflict_do_nothing(index_elements=[Product.product_name])
+        else:
+            query = query.on_conflict_do_update(
+                index_elements=[Product.product_name],
+                set_={
+                    "quantity": query.excluded.quantity,
+                    "version": Product.version + 1,
+                },
+            )
+            if dialect == "postgresql":
+                # xmax = 0 только у вставленной строки, не у обновлённой
+                columns.append(literal_column("xmax = 0"))
+            else:
+                # в SQLite xmax нет: смотрим названия в той же транзакции,
+                # SQLite не даст другому писателю вклиниться до вставки
+                existing = await self.get_ids_by_names(
+                    [row["product_name"] for row in rows]
+                )
+        result = await self.session.execute(query.returning(*columns))
+        written = {
+            name: (id_, created[0] if created else name not in existing, version)
+            for name, id_, version, *created in result.all()
+        }
+        await self.session.commit()
+        return written
+
+    async def create(self, product_data: ProductCreate) -> Product | None:
+        """INSERT ... ON CONFLICT DO NOTHING RETURNING: уникальность названия
+        проверяет сама БД. None - название уже занято"""
+        insert = DIALECT_INSERT[self.session.get_bind().dialect.name]
+        query = (
+            insert(Product)
+            .values(
+                product_name=product_data.product_name,
+                quantity=product_data.quantity,
+            )
+            .on_conflict_do_nothing(index_elements=[Product.product_name])
+            .returning(Product)
         )
-        self.session.add(product)
+        result = await self.session.execute(query)
+        product = result.scalars().one_or_none()
         await self.session.commit()  # фиксируем изменения
-        await self.session.refresh(product)  # обновляем объект с id
         return product
 
-    async def update(self, product_id: int, product_data: ProductUpdate) -> Product:
-        product = await self.get_by_id(product_id)
-        if not product:
-            return None
-
+    async def update(
+        self, product_id: int, product_data: ProductUpdate
+    ) -> Product | None:
+        """UPDATE ... RETURNING одним запросом; занятое название - IntegrityError"""
         update_data = product_data.model_dump(exclude_unset=True)
+        if not update_data:
+            return await self.get_by_id(product_id)
 
-        for k, v in update_data.items():
-            setattr(product, k, v)
-
+        query = (
+            update(Product)
+            .where(Product.id == product_id)
+            .values(**update_data, version=Product.version + 1)
+            .returning(Product)
+            .execution_options(populate_existing=True)
+        )
+        try:
+            result = await self.session.execute(query)
+        except IntegrityError:
+            await self.session.rollback()
+            raise
+        product = result.scalars().one_or_none()
         await self.session.commit()
-        await self.session.refresh(product)
         return product
 
     async def delete(self, product_id: int) -> None:
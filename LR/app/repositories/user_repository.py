@@ -1,3 +1,4 @@
+from LR.app.repositories.dialect import DIALECT_INSERT
 from LR.orm.db import User
 from LR.orm.model import UserCreate, UserUpdate
 from sqlalchemy import select
@@ -13,8 +14,19 @@ class UserRepository:
         result = await self.session.execute(query)
         return result.scalars().one_or_none()
 
+    async def get_many(self, user_ids: list[int]) -> list[User]:
+        if not user_ids:
+            return []
+        query = select(User).where(User.id.in_(user_ids))
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
+
     async def get_by_filter(
-        self, count: int | None = None, page: int | None = None, **kwargs
+        self,
+        count: int | None = None,
+        page: int | None = None,
+        after: int | None = None,
+        **kwargs,
     ) -> list[User]:
         query = select(User)
         if kwargs:
@@ -22,22 +34,35 @@ class UserRepository:
                 if hasattr(User, key) and value is not None:
                     query = query.where(getattr(User, key) == value)
 
-        if count is not None and page is not None:
+        if after is not None:
+            # keyset: сразу к нужному месту по индексу первичного ключа
+            query = query.where(User.id > after).order_by(User.id)
+            if count is not None:
+                query = query.limit(count)
+        elif count is not None and page is not None:
             offset = (page - 1) * count
             query = query.offset(offset).limit(count)
 
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
-    async def create(self, user_data: UserCreate) -> User:
-        user = User(
-            username=user_data.username,
-            email=user_data.email,
-            description=user_data.description or "",
+    async def create(self, user_data: UserCreate) -> User | None:
+        """INSERT ... ON CONFLICT DO NOTHING RETURNING: уникальность email
+        проверяет сама БД. None - email уже занят"""
+        insert = DIALECT_INSERT[self.session.get_bind().dialect.name]
+        query = (
+            insert(User)
+            .values(
+                username=user_data.username,
+                email=user_data.email,
+                description=user_data.description or "",
+            )
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User)
         )
-        self.session.add(user)
+        result = await self.session.execute(query)
+        user = result.scalars().one_or_none()
         await self.session.commit()  # фиксируем изменения
-        await self.session.refresh(user)  # обновляем объект с id
         return user
 
     async def update(self, user_id: int, user_data: UserUpdate) -> User:
@@ -49,6 +74,7 @@ class UserRepository:
 
         for k, v in update_data.items():
             setattr(user, k, v)
+        user.version = User.version + 1
 
         await self.session.commit()
         await self.session.refresh(user)
@@ -1,8 +1,22 @@
+from LR.app.cache import (
+    ORDER_CACHE_TTL,
+    CacheWriteBuffer,
+    ListCache,
+    cache_writes,
+    fill_cache,
+    order_cache_stats,
+    version_key,
+)
+from LR.app.pagination import page_json
 from LR.app.repositories.order_repository import OrderRepository
 from LR.app.repositories.product_repository import ProductRepository
 from LR.app.repositories.user_repository import UserRepository
 from LR.orm.db import Order
-from LR.orm.model import OrderCreate, OrderUpdate
+from LR.orm.model import OrderCreate, OrderResponse, OrderUpdate
+from pydantic import TypeAdapter
+from redis.asyncio import Redis
+
+ORDER_PAGE = TypeAdapter(list[OrderResponse])
 
 
 class OrderService:
@@ -12,36 +26,76 @@ class OrderService:
         order_repository: OrderRepository,
         user_repository: UserRepository,
         product_repository: ProductRepository,
+        redis_client: Redis | None = None,
+        list_cache: ListCache | None = None,
+        cache_buffer: CacheWriteBuffer | None = None,
     ):
         self.order_repository = order_repository
         self.user_repository = user_repository
         self.product_repository = product_repository
+        self.redis = redis_client
+        self.list_cache = list_cache
+        # общий буфер записей в кэш, который владелец сбросит после COMMIT
+        self.cache_buffer = cache_buffer
+
+    async def get_by_id(self, order_id: int) -> OrderResponse | None:
+        body = await self.get_json_by_id(order_id)
+        return OrderResponse.model_validate_json(body) if body else None
 
-    async def get_by_id(self, order_id: int) -> Order | None:
-        return await self.order_repository.get_by_id(order_id)
+    async def get_json_by_id(self, order_id: int) -> bytes | None:
+        """Заказ готовым JSON: попадание в кэш отдаётся без разбора"""
+        key = f"order:{order_id}"
+        version = None
+        if self.redis is not None:
+            # версия нужна, чтобы не записать заказ, изменённый во время чтения
+            cached, version = await self.redis.mget(key, version_key(key))
+            if cached:
+                order_cache_stats.hit()
+                return cached.encode()
+            order_cache_stats.miss()
+
+        # заказ с позициями и товарами - три запроса к БД
+        order = await self.order_repository.get_by_id(order_id)
+        if not order:
+            return None
+        body = OrderResponse.model_validate(
+            order, from_attributes=True
+        ).model_dump_json()
+        if self.redis is not None:
+            await fill_cache(self.redis, key, version, ORDER_CACHE_TTL, body)
+        return body.encode()
 
     async def get_by_filter(
         self, count: int = 10, page: int = 1, **kwargs
     ) -> list[Order]:
         return await self.order_repository.get_by_filter(count, page, **kwargs)
 
-    async def create(self, order_data: OrderCreate) -> Order:
+    async def get_page(
+        self, count: int = 10, page: int = 1, **kwargs
+    ) -> tuple[bytes, str | None]:
+        """Страница заказов готовым JSON и курсор следующей страницы"""
+
+        async def load():
+            orders = await self.get_by_filter(count, page, **kwargs)
+            return page_json(ORDER_PAGE, orders, count, "after" in kwargs)
+
+        if self.list_cache is None:
+            return await load()
+        return await self.list_cache.get_or_load(load, count=count, page=page, **kwargs)
+
+    async def create(self, order_data: OrderCreate) -> OrderResponse:
 
         user = await self.user_repository.get_by_id(order_data.user_id)
         if not user:
             raise ValueError("User not found")
 
-        # проверяем все товары
-        for item in order_data.items:
-            product = await self.product_repository.get_by_id(item.product_id)
-            if not product:
-                raise ValueError(f"Product {item.product_id} not found")
-            if product.quantity < item.quantity:
-                raise ValueError(
-                    f"Not enough stock for product {product.id} ({product.product_name})"
-                )
+        # остатки списываются в той же транзакции, что и вставка заказа
+        reserved = await self._check_stock(order_data.items, reserve=True)
+        order = await self.order_repository.create(order_data)
 
-        return await self.order_repository.create(order_data)
+        async with self._cache_writes() as writes:
+            self._invalidate_stock(writes, reserved)
+        return order
 
     async def update(self, order_id: int, order_data: OrderUpdate) -> Order:
         # проверяем пользователя, если он указан
@@ -50,18 +104,138 @@ class OrderService:
             if not user:
                 raise ValueError("User not found")
 
-        # проверяем товары, если они указаны
+        # разница в товарах списывается или возвращается на склад в той же
+        # транзакции, что и изменение позиций
+        reserved: dict[int, int | None] = {}
         if order_data.items is not None:
-            for item in order_data.items:
-                product = await self.product_repository.get_by_id(item.product_id)
-                if not product:
-                    raise ValueError(f"Product {item.product_id} not found")
-                if product.quantity < item.quantity:
-                    raise ValueError(
-                        f"Not enough stock for product {product.id} ({product.product_name})"
-                    )
+            # заказ блокируется: параллельные изменения считают разницу
+            # от уже зафиксированных позиций, а не от одних и тех же старых
+            order = await self.order_repository.get_by_id(order_id, for_update=True)
+            if not order:
+                return None
+            reserved = await self._apply_stock(
+                self._item_changes(order, order_data.items), reserve=True
+            )
+
+        updated = await self.order_repository.update(order_id, order_data)
+        async with self._cache_writes() as writes:
+            self._invalidate_order(writes, order_id)
+            self._invalidate_stock(writes, reserved)
+        return updated
+
+    @staticmethod
+    def _item_changes(order: Order, items: list) -> dict[int, int]:
+        """Сколько каждого товара добавляет (+) или возвращает (-) изменение
+        позиций заказа. Позиции применяются по порядку, как в репозитории"""
+        lines = {item.id: (item.product_id, item.quantity) for item in order.items}
+        changes: dict[int, int] = {}
+        for item in items:
+            _check_quantity(item.product_id, item.quantity)
+            if item.id is not None:
+                if item.id not in lines:
+                    continue  # чужую позицию репозиторий не изменит
+                old_product_id, old_quantity = lines[item.id]
+                changes[old_product_id] = changes.get(old_product_id, 0) - old_quantity
+                product_id = item.product_id or old_product_id
+                quantity = item.quantity or old_quantity
+                lines[item.id] = (product_id, quantity)
+            elif item.product_id is None or item.quantity is None:
+                raise ValueError("New order item needs product_id and quantity")
+            else:
+                product_id, quantity = item.product_id, item.quantity
+            changes[product_id] = changes.get(product_id, 0) + quantity
+        return {product_id: q for product_id, q in changes.items() if q}
+
+    async def _check_stock(
+        self, items: list, reserve: bool = False
+    ) -> dict[int, int | None]:
+        """Проверить наличие и остатки всех товаров заказа одним запросом,
+        с reserve=True - списать их (см. _apply_stock)"""
+        # одинаковые товары в разных позициях суммируем
+        quantities: dict[int, int] = {}
+        for item in items:
+            _check_quantity(item.product_id, item.quantity)
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + (
+                item.quantity or 0
+            )
+        return await self._apply_stock(quantities, reserve)
 
-        return await self.order_repository.update(order_id, order_data)
+    async def _apply_stock(
+        self, quantities: dict[int, int], reserve: bool = False
+    ) -> dict[int, int | None]:
+        """Проверить остатки товаров одним запросом.
+
+        С reserve=True строки товаров блокируются до конца транзакции,
+        а остатки списываются - так параллельные заказы не продадут больше,
+        чем есть на складе. Отрицательное количество возвращает товар на
+        склад. Возвращает id товаров и их новые версии.
+        """
+        products = await self.product_repository.get_many(
+            list(quantities), for_update=reserve
+        )
+        products_by_id = {product.id: product for product in products}
+
+        for product_id, quantity in quantities.items():
+            product = products_by_id.get(product_id)
+            if not product:
+                if quantity < 0:
+                    continue  # товар удалён - возвращать некуда
+                raise ValueError(f"Product {product_id} not found")
+            if product.quantity < quantity:
+                raise ValueError(
+                    f"Not enough stock for product {product.id} ({product.product_name})"
+                )
+
+        versions: dict[int, int | None] = dict.fromkeys(quantities)
+        if reserve:
+            for product in products:
+                versions[product.id] = self.product_repository.reserve(
+                    product, quantities[product.id]
+                )
+        return versions
 
     async def delete(self, order_id: int) -> None:
-        return await self.order_repository.delete(order_id)
+        # товары заказа возвращаются на склад в транзакции удаления
+        released: dict[int, int | None] = {}
+        order = await self.order_repository.get_by_id(order_id, for_update=True)
+        if order:
+            quantities: dict[int, int] = {}
+            for item in order.items:
+                quantities[item.product_id] = (
+                    quantities.get(item.product_id, 0) - item.quantity
+                )
+            released = await self._apply_stock(quantities, reserve=True)
+        delet = await self.order_repository.delete(order_id)
+        async with self._cache_writes() as writes:
+            self._invalidate_order(writes, order_id)
+            self._invalidate_stock(writes, released)
+        return delet
+
+    def _cache_writes(self):
+        # без своего клиента Redis страницы списков сбрасываются через их кэш
+        redis = self.redis
+        if redis is None and self.list_cache is not None:
+            redis = self.list_cache.redis
+        return cache_writes(redis, self.cache_buffer)
+
+    def _invalidate_stock(
+        self, writes: CacheWriteBuffer, versions: dict[int, int | None]
+    ) -> None:
+        """Остатки товаров изменились - сбросить их ключи и страницы"""
+        if self.redis is not None:
+            for product_id, version in versions.items():
+                writes.invalidate(f"product:{product_id}", version=version)
+        if versions and self.list_cache is not None:
+            writes.invalidate_lists(self.list_cache.tag, "products")
+
+    def _invalidate_order(self, writes: CacheWriteBuffer, order_id: int) -> None:
+        if self.redis is not None:
+            writes.invalidate(f"order:{order_id}")
+        if self.list_cache is not None:
+            writes.invalidate_lists(self.list_cache.tag)
+
+
+def _check_quantity(product_id: int | None, quantity: int | None) -> None:
+    # отрицательное количество при списании увеличило бы остаток
+    if quantity is not None and quantity <= 0:
+        raise ValueError(f"Quantity for product {product_id} must be positive")
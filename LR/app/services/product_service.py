@@ -1,63 +1,342 @@
-import json
+import logging
+import time
+from typing import AsyncIterable
 
+from LR.app.cache import (
+    CACHE_WRITE_MODE,
+    DELETED_VERSION,
+    WRITE_THROUGH,
+    CacheWriteBuffer,
+    ListCache,
+    LocalCache,
+    SingleFlight,
+    cache_writes,
+    fill_cache,
+    get_with_ttl,
+    version_key,
+)
+from LR.app.pagination import page_json
 from LR.app.repositories.product_repository import ProductRepository
 from LR.orm.db import Product
 from LR.orm.model import ProductCreate, ProductResponse, ProductUpdate
-from redis import Redis
+from pydantic import TypeAdapter, ValidationError
+from redis.asyncio import Redis
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+PRODUCT_CACHE_TTL = 600
+PRODUCT_PAGE = TypeAdapter(list[ProductResponse])
+
+# сколько строк пакетной загрузки проверяется и вставляется одним запросом
+BULK_CHUNK_SIZE = 1000
+# результат строки пакетной загрузки
+CREATED = "created"
+UPDATED = "updated"
+SKIPPED = "skipped"  # название занято, строка не изменена
+INVALID = "invalid"
 
 
 class ProductService:
-    def __init__(self, product_repository: ProductRepository, redis_client: Redis):
+    def __init__(
+        self,
+        product_repository: ProductRepository,
+        redis_client: Redis,
+        local_cache: LocalCache | None = None,
+        list_cache: ListCache | None = None,
+        flight: SingleFlight | None = None,
+        cache_buffer: CacheWriteBuffer | None = None,
+        write_through: bool = CACHE_WRITE_MODE == WRITE_THROUGH,
+        session_factory: sessionmaker | None = None,
+    ):
         self.product_repository = product_repository
         self.redis = redis_client
+        self.local_cache = local_cache
+        self.list_cache = list_cache
+        self.flight = flight
+        # общий буфер записей в кэш, который владелец сбросит после COMMIT
+        self.cache_buffer = cache_buffer
+        # при изменении записывать новое значение, а не удалять ключ
+        self.write_through = write_through
+        # сессии для общих загрузок SingleFlight, см. _shared_load
+        self.session_factory = session_factory
+
+    async def get_by_id(self, product_id: int) -> ProductResponse | None:
+        body = await self.get_json_by_id(product_id)
+        return ProductResponse.model_validate_json(body) if body else None
 
-    async def get_by_id(self, product_id: int) -> Product | None:
+    async def get_json_by_id(self, product_id: int) -> bytes | None:
+        """Продукт готовым JSON: попадание в кэш отдаётся без разбора"""
         key = f"product:{product_id}"
-        cached = self.redis.get(key)
+        if self.local_cache is not None:
+            local = self.local_cache.get(key)
+            if local is not None:
+                return local
+
+        if self.flight is not None and self.flight.early_refresh > 0:
+            cached, ttl_left = await get_with_ttl(self.redis, key)
+        else:
+            cached, ttl_left = await self.redis.get(key), -1
         if cached:
-            data = json.loads(cached)
-            return Product(**data)
+            body = cached.encode()
+            if self.flight is None or not self.flight.refresh_early(ttl_left):
+                self._remember(key, body)
+                return body
+            # этот запрос обновит ключ заранее, остальные получат старое значение
+            return await self.flight.do(key, lambda: self._shared_load(product_id))
 
-        product = await self.product_repository.get_by_id(product_id)
-        if product:
-            product_data = ProductResponse.model_validate(product, from_attributes=True)
-            self.redis.setex(key, 600, product_data.model_dump_json())
-        return product
+        if self.flight is None:
+            return await self._load(product_id)
+        # промахи по одному ключу ждут одну загрузку из БД
+        return await self.flight.do(key, lambda: self._shared_load(product_id))
+
+    async def _shared_load(self, product_id: int) -> bytes | None:
+        """Загрузка для SingleFlight. Её ждут и другие запросы, а сессию
+        первого закроют при его отмене - поэтому читаем в своей сессии"""
+        if self.session_factory is None:
+            return await self._load(product_id)
+        async with self.session_factory() as session:
+            return await self._load(product_id, ProductRepository(session))
+
+    async def _load(
+        self, product_id: int, product_repository: ProductRepository | None = None
+    ) -> bytes | None:
+        key = f"product:{product_id}"
+        # версия ключа до чтения из БД: если запись изменят, пока мы читаем,
+        # устаревшее значение в кэш не попадёт
+        version = await self.redis.get(version_key(key))
+        product_repository = product_repository or self.product_repository
+        product = await product_repository.get_by_id(product_id)
+        if not product:
+            return None
+        body = ProductResponse.model_validate(
+            product, from_attributes=True
+        ).model_dump_json()
+        if await fill_cache(self.redis, key, version, PRODUCT_CACHE_TTL, body):
+            self._remember(key, body.encode())
+        return body.encode()
+
+    async def get_json_many(self, product_ids: list[int]) -> bytes:
+        """Продукты по списку id одним JSON-массивом в порядке запроса.
+        Кэш читается одним MGET, промахи - одним запросом WHERE id IN (...)"""
+        bodies: dict[int, bytes] = {}
+        if self.local_cache is not None:
+            for product_id in product_ids:
+                local = self.local_cache.get(f"product:{product_id}")
+                if local is not None:
+                    bodies[product_id] = local
+
+        wanted = [i for i in product_ids if i not in bodies]
+        versions: dict[int, str | None] = {}
+        if wanted:
+            keys = [f"product:{i}" for i in wanted]
+            # вместе со значениями читаются их версии - для записи промахов
+            values = await self.redis.mget(keys + [version_key(k) for k in keys])
+            for product_id, value, version in zip(wanted, values, values[len(keys) :]):
+                if value:
+                    bodies[product_id] = value.encode()
+                    self._remember(f"product:{product_id}", bodies[product_id])
+                else:
+                    versions[product_id] = version
+
+        missing = [i for i in product_ids if i not in bodies]
+        if missing:
+            products = await self.product_repository.get_many(missing)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for product in products:
+                    body = ProductResponse.model_validate(
+                        product, from_attributes=True
+                    ).model_dump_json()
+                    bodies[product.id] = body.encode()
+                    await fill_cache(
+                        pipe,
+                        f"product:{product.id}",
+                        versions[product.id],
+                        PRODUCT_CACHE_TTL,
+                        body,
+                    )
+                filled = await pipe.execute()
+            for product, ok in zip(products, filled):
+                if ok:
+                    self._remember(f"product:{product.id}", bodies[product.id])
+
+        # несуществующие id в ответ не попадают
+        return b"[" + b",".join(bodies[i] for i in product_ids if i in bodies) + b"]"
+
+    def _remember(self, key: str, body: bytes) -> None:
+        if self.local_cache is not None:
+            self.local_cache.set(key, body)
 
     async def get_by_filter(
         self, count: int = 10, page: int = 1, **kwargs
     ) -> list[Product]:
         return await self.product_repository.get_by_filter(count, page, **kwargs)
 
-    async def create(self, product_data: ProductCreate) -> Product:
-        filt = await self.product_repository.get_by_filter(
-            product_name=product_data.product_name
+    async def get_page(
+        self, count: int = 10, page: int = 1, **kwargs
+    ) -> tuple[bytes, str | None]:
+        """Страница продуктов готовым JSON и курсор следующей страницы"""
+
+        async def load():
+            products = await self.get_by_filter(count, page, **kwargs)
+            return page_json(PRODUCT_PAGE, products, count, "after" in kwargs)
+
+        if self.list_cache is None:
+            return await load()
+        return await self.list_cache.get_or_load(load, count=count, page=page, **kwargs)
+
+    async def bulk_upsert(
+        self,
+        rows: AsyncIterable[dict | bytes],
+        update: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE,
+    ) -> list[dict]:
+        """Создать продукты пачками по chunk_size строк: одна многострочная
+        вставка на пачку, COMMIT и сброс кэша - на пачку.
+        С update=True у существующих продуктов обновляется остаток.
+        Строка - dict или JSON (bytes). Возвращает результат по каждой строке
+        в порядке запроса."""
+        results: list[dict] = []
+        chunk: list[tuple[int, ProductCreate]] = []
+        names: set[str] = set()
+        started = time.perf_counter()
+        async for row in rows:
+            row_no = len(results)
+            results.append({"row": row_no})
+            try:
+                product = self._bulk_row(row, names)
+            except ValueError as e:
+                results[row_no].update(status=INVALID, detail=_error_detail(e))
+                continue
+            names.add(product.product_name)
+            chunk.append((row_no, product))
+            if len(chunk) >= chunk_size:
+                await self._write_chunk(chunk, update, results)
+                chunk = []
+        await self._write_chunk(chunk, update, results)
+
+        elapsed = time.perf_counter() - started
+        logging.info(
+            "Bulk products: %d rows in %.2f s, %.0f rows/s",
+            len(results),
+            elapsed,
+            len(results) / elapsed if elapsed else 0.0,
         )
-        if filt:
-            raise ValueError("With this product name already exists")
+        return results
+
+    @staticmethod
+    def _bulk_row(row: dict | bytes, names: set[str]) -> ProductCreate:
+        if isinstance(row, (bytes, str)):
+            product = ProductCreate.model_validate_json(row)
+        else:
+            product = ProductCreate.model_validate(row)
+        if product.quantity < 0:
+            raise ValueError("The product cannot be a negative number")
+        if product.product_name in names:
+            raise ValueError("Duplicate product name in request")
+        return product
 
+    async def _write_chunk(
+        self,
+        chunk: list[tuple[int, ProductCreate]],
+        update: bool,
+        results: list[dict],
+    ) -> None:
+        if not chunk:
+            return
+        # статус строки берём из RETURNING вставки, а не из проверки до неё
+        written = await self.product_repository.insert_many(
+            [product.model_dump() for _, product in chunk], update
+        )
+        existing = await self.product_repository.get_ids_by_names(
+            [p.product_name for _, p in chunk if p.product_name not in written]
+        )
+        # пачка уже зафиксирована: кэш сбрасываем сразу, а не после всей
+        # загрузки - иначе ошибка в следующей пачке потеряла бы сброс
+        async with cache_writes(self.redis, self.cache_buffer) as writes:
+            for row_no, product in chunk:
+                name = product.product_name
+                if name not in written:
+                    results[row_no].update(
+                        status=SKIPPED,
+                        id=existing.get(name),
+                        detail="With this product name already exists",
+                    )
+                    continue
+                product_id, created, version = written[name]
+                if created:
+                    results[row_no].update(status=CREATED, id=product_id)
+                else:
+                    results[row_no].update(status=UPDATED, id=product_id)
+                    writes.invalidate(
+                        f"product:{product_id}", self.local_cache, version
+                    )
+            if written:
+                self._invalidate_lists(writes)
+
+    async def create(self, product_data: ProductCreate) -> Product:
         if product_data.quantity < 0:
             raise ValueError("The product cannot be a negative number")
 
+        # уникальность названия проверяет сама вставка (ON CONFLICT)
         product = await self.product_repository.create(product_data)
+        if product is None:
+            raise ValueError("With this product name already exists")
         product_data = ProductResponse.model_validate(product, from_attributes=True)
-        self.redis.setex(f"product:{product.id}", 600, product_data.model_dump_json())
+        async with cache_writes(self.redis, self.cache_buffer) as writes:
+            writes.set(
+                f"product:{product.id}",
+                PRODUCT_CACHE_TTL,
+                product_data.model_dump_json(),
+                version=product.version,
+            )
+            self._invalidate_lists(writes)
         return product
 
     async def update(self, product_id: int, product_data: ProductUpdate) -> Product:
-        filt = await self.product_repository.get_by_filter(
-            product_name=product_data.product_name
-        )
-        if filt:
-            raise ValueError("With this product name already exists")
-        if product_data.quantity < 0:
+        if product_data.quantity is not None and product_data.quantity < 0:
             raise ValueError("The product cannot be a negative number")
 
-        updated = await self.product_repository.update(product_id, product_data)
-        self.redis.delete(f"product:{product_id}")
+        try:
+            # занятое название отклонит уникальный индекс, без отдельной проверки
+            updated = await self.product_repository.update(product_id, product_data)
+        except IntegrityError as e:
+            raise ValueError("With this product name already exists") from e
+        async with cache_writes(self.redis, self.cache_buffer) as writes:
+            key = f"product:{product_id}"
+            # версия строки не даст записи более ранней транзакции,
+            # опоздавшей в Redis, затереть это значение
+            if updated is None:
+                writes.invalidate(key, self.local_cache)
+            elif self.write_through:
+                body = ProductResponse.model_validate(
+                    updated, from_attributes=True
+                ).model_dump_json()
+                writes.set(
+                    key, PRODUCT_CACHE_TTL, body, self.local_cache, updated.version
+                )
+            else:
+                writes.invalidate(key, self.local_cache, updated.version)
+            self._invalidate_lists(writes)
         return updated
 
     async def delete(self, product_id: int) -> None:
         delet = await self.product_repository.delete(product_id)
-        self.redis.delete(f"product:{product_id}")
+        async with cache_writes(self.redis, self.cache_buffer) as writes:
+            writes.invalidate(
+                f"product:{product_id}", self.local_cache, DELETED_VERSION
+            )
+            self._invalidate_lists(writes)
         return delet
+
+    def _invalidate_lists(self, writes: CacheWriteBuffer) -> None:
+        if self.list_cache is not None:
+            writes.invalidate_lists(self.list_cache.tag)
+
+
+def _error_detail(error: ValueError) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}"
+            for e in error.errors()
+        )
+    return str(error)
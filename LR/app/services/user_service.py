@@ -1,50 +1,214 @@
-import json
-
+from LR.app.cache import (
+    CACHE_WRITE_MODE,
+    DELETED_VERSION,
+    WRITE_THROUGH,
+    CacheWriteBuffer,
+    ListCache,
+    LocalCache,
+    SingleFlight,
+    cache_writes,
+    fill_cache,
+    get_with_ttl,
+    version_key,
+)
+from LR.app.pagination import page_json
 from LR.app.repositories.user_repository import UserRepository
 from LR.orm.db import User
 from LR.orm.model import UserCreate, UserResponse, UserUpdate
-from redis import Redis
+from pydantic import TypeAdapter
+from redis.asyncio import Redis
+from sqlalchemy.orm import sessionmaker
+
+USER_CACHE_TTL = 3600
+USER_PAGE = TypeAdapter(list[UserResponse])
 
 
 class UserService:
-    def __init__(self, user_repository: UserRepository, redis_client: Redis):
+    def __init__(
+        self,
+        user_repository: UserRepository,
+        redis_client: Redis,
+        local_cache: LocalCache | None = None,
+        list_cache: ListCache | None = None,
+        flight: SingleFlight | None = None,
+        cache_buffer: CacheWriteBuffer | None = None,
+        write_through: bool = CACHE_WRITE_MODE == WRITE_THROUGH,
+        session_factory: sessionmaker | None = None,
+    ):
         self.user_repository = user_repository
         self.redis = redis_client
+        self.local_cache = local_cache
+        self.list_cache = list_cache
+        self.flight = flight
+        # общий буфер записей в кэш, который владелец сбросит после COMMIT
+        self.cache_buffer = cache_buffer
+        # при изменении записывать новое значение, а не удалять ключ
+        self.write_through = write_through
+        # сессии для общих загрузок SingleFlight, см. _shared_load
+        self.session_factory = session_factory
+
+    async def get_by_id(self, user_id: int) -> UserResponse | None:
+        body = await self.get_json_by_id(user_id)
+        return UserResponse.model_validate_json(body) if body else None
 
-    async def get_by_id(self, user_id: int) -> User | None:
+    async def get_json_by_id(self, user_id: int) -> bytes | None:
+        """Пользователь готовым JSON: попадание в кэш отдаётся без разбора"""
         key = f"user:{user_id}"
-        cached = self.redis.get(key)
+        if self.local_cache is not None:
+            local = self.local_cache.get(key)
+            if local is not None:
+                return local
+
+        if self.flight is not None and self.flight.early_refresh > 0:
+            cached, ttl_left = await get_with_ttl(self.redis, key)
+        else:
+            cached, ttl_left = await self.redis.get(key), -1
         if cached:
-            data = json.loads(cached)
-            return User(**data)
+            body = cached.encode()
+            if self.flight is None or not self.flight.refresh_early(ttl_left):
+                self._remember(key, body)
+                return body
+            # этот запрос обновит ключ заранее, остальные получат старое значение
+            return await self.flight.do(key, lambda: self._shared_load(user_id))
 
-        user = await self.user_repository.get_by_id(user_id)
-        if user:
-            user_data = UserResponse.model_validate(user, from_attributes=True)
-            self.redis.setex(key, 3600, user_data.model_dump_json())
-        return user
+        if self.flight is None:
+            return await self._load(user_id)
+        # промахи по одному ключу ждут одну загрузку из БД
+        return await self.flight.do(key, lambda: self._shared_load(user_id))
+
+    async def _shared_load(self, user_id: int) -> bytes | None:
+        """Загрузка для SingleFlight. Её ждут и другие запросы, а сессию
+        первого закроют при его отмене - поэтому читаем в своей сессии"""
+        if self.session_factory is None:
+            return await self._load(user_id)
+        async with self.session_factory() as session:
+            return await self._load(user_id, UserRepository(session))
+
+    async def _load(
+        self, user_id: int, user_repository: UserRepository | None = None
+    ) -> bytes | None:
+        key = f"user:{user_id}"
+        # версия ключа до чтения из БД: если запись изменят, пока мы читаем,
+        # устаревшее значение в кэш не попадёт
+        version = await self.redis.get(version_key(key))
+        user_repository = user_repository or self.user_repository
+        user = await user_repository.get_by_id(user_id)
+        if not user:
+            return None
+        body = UserResponse.model_validate(user, from_attributes=True).model_dump_json()
+        if await fill_cache(self.redis, key, version, USER_CACHE_TTL, body):
+            self._remember(key, body.encode())
+        return body.encode()
+
+    async def get_json_many(self, user_ids: list[int]) -> bytes:
+        """Пользователи по списку id одним JSON-массивом в порядке запроса.
+        Кэш читается одним MGET, промахи - одним запросом WHERE id IN (...)"""
+        bodies: dict[int, bytes] = {}
+        if self.local_cache is not None:
+            for user_id in user_ids:
+                local = self.local_cache.get(f"user:{user_id}")
+                if local is not None:
+                    bodies[user_id] = local
+
+        wanted = [i for i in user_ids if i not in bodies]
+        versions: dict[int, str | None] = {}
+        if wanted:
+            keys = [f"user:{i}" for i in wanted]
+            # вместе со значениями читаются их версии - для записи промахов
+            values = await self.redis.mget(keys + [version_key(k) for k in keys])
+            for user_id, value, version in zip(wanted, values, values[len(keys) :]):
+                if value:
+                    bodies[user_id] = value.encode()
+                    self._remember(f"user:{user_id}", bodies[user_id])
+                else:
+                    versions[user_id] = version
+
+        missing = [i for i in user_ids if i not in bodies]
+        if missing:
+            users = await self.user_repository.get_many(missing)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for user in users:
+                    body = UserResponse.model_validate(
+                        user, from_attributes=True
+                    ).model_dump_json()
+                    bodies[user.id] = body.encode()
+                    await fill_cache(
+                        pipe,
+                        f"user:{user.id}",
+                        versions[user.id],
+                        USER_CACHE_TTL,
+                        body,
+                    )
+                filled = await pipe.execute()
+            for user, ok in zip(users, filled):
+                if ok:
+                    self._remember(f"user:{user.id}", bodies[user.id])
+
+        # несуществующие id в ответ не попадают
+        return b"[" + b",".join(bodies[i] for i in user_ids if i in bodies) + b"]"
+
+    def _remember(self, key: str, body: bytes) -> None:
+        if self.local_cache is not None:
+            self.local_cache.set(key, body)
 
     async def get_by_filter(
         self, count: int = 10, page: int = 1, **kwargs
     ) -> list[User]:
         return await self.user_repository.get_by_filter(count, page, **kwargs)
 
-    async def create(self, user_data: UserCreate) -> User:
-        filt = await self.user_repository.get_by_filter(email=user_data.email)
-        if filt:
-            raise ValueError("User with this email address already exists")
+    async def get_page(
+        self, count: int = 10, page: int = 1, **kwargs
+    ) -> tuple[bytes, str | None]:
+        """Страница пользователей готовым JSON и курсор следующей страницы"""
 
+        async def load():
+            users = await self.get_by_filter(count, page, **kwargs)
+            return page_json(USER_PAGE, users, count, "after" in kwargs)
+
+        if self.list_cache is None:
+            return await load()
+        return await self.list_cache.get_or_load(load, count=count, page=page, **kwargs)
+
+    async def create(self, user_data: UserCreate) -> User:
         user = await self.user_repository.create(user_data)
+        if user is None:
+            raise ValueError("User with this email address already exists")
         user_data = UserResponse.model_validate(user, from_attributes=True)
-        self.redis.setex(f"user:{user.id}", 3600, user_data.model_dump_json())
+        async with cache_writes(self.redis, self.cache_buffer) as writes:
+            writes.set(
+                f"user:{user.id}",
+                USER_CACHE_TTL,
+                user_data.model_dump_json(),
+                version=user.version,
+            )
+            self._invalidate_lists(writes)
         return user
 
     async def update(self, user_id: int, user_data: UserUpdate) -> User:
         updated = await self.user_repository.update(user_id, user_data)
-        self.redis.delete(f"user:{user_id}")
+        async with cache_writes(self.redis, self.cache_buffer) as writes:
+            key = f"user:{user_id}"
+            # версия строки не даст записи более ранней транзакции,
+            # опоздавшей в Redis, затереть это значение
+            if updated is None:
+                writes.invalidate(key, self.local_cache)
+            elif self.write_through:
+                body = UserResponse.model_validate(
+                    updated, from_attributes=True
+                ).model_dump_json()
+                writes.set(key, USER_CACHE_TTL, body, self.local_cache, updated.version)
+            else:
+                writes.invalidate(key, self.local_cache, updated.version)
+            self._invalidate_lists(writes)
         return updated
 
     async def delete(self, user_id: int) -> None:
         delet = await self.user_repository.delete(user_id)
-        self.redis.delete(f"user:{user_id}")
+        async with cache_writes(self.redis, self.cache_buffer) as writes:
+            writes.invalidate(f"user:{user_id}", self.local_cache, DELETED_VERSION)
+            self._invalidate_lists(writes)
         return delet
+
+    def _invalidate_lists(self, writes: CacheWriteBuffer) -> None:
+        if self.list_cache is not None:
+            writes.invalidate_lists(self.list_cache.tag)
@@ -0,0 +1,41 @@
+import pytest
+from litestar.di import Provide
+from litestar.status_codes import HTTP_200_OK
+from litestar.testing import create_test_client
+from LR.app.controllers.metrics_controller import MetricsController
+from LR.app.database import MeteredPool, create_engine, pool_stats
+from sqlalchemy import text
+
+
+@pytest.mark.asyncio
+async def test_pool_stats():
+    """Тест счётчиков пула: занятые соединения и число получений"""
+    engine = create_engine(
+        "sqlite+aiosqlite:///./test.db", poolclass=MeteredPool, pool_size=2
+    )
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            stats = pool_stats(engine)
+            assert stats["checked_out"] == 1
+            assert stats["acquired"] == 1
+
+        stats = pool_stats(engine)
+        assert stats["checked_out"] == 0
+        assert stats["size"] == 2
+        assert stats["timeouts"] == 0
+    finally:
+        await engine.dispose()
+
+
+def test_get_metrics(engine):
+    """Тест эндпоинта /metrics"""
+    with create_test_client(
+        route_handlers=[MetricsController],
+        dependencies={"db_engine": Provide(lambda: engine, sync_to_thread=False)},
+    ) as client:
+        response = client.get("/metrics")
+        assert response.status_code == HTTP_200_OK
+        body = response.json()
+        assert "checked_out" in body["db_pool"]
+        assert set(body["local_cache"]) == {"user", "product"}
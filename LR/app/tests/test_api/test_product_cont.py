@@ -1,6 +1,8 @@
+import json
 from unittest.mock import AsyncMock, Mock
 
 import pytest
+from fakeredis.aioredis import FakeRedis
 from litestar.di import Provide
 from litestar.status_codes import HTTP_200_OK, HTTP_201_CREATED, HTTP_204_NO_CONTENT
 from litestar.testing import create_test_client
@@ -42,10 +44,8 @@ def test_get_product_by_id(product: Product):
     mock_product_repo = AsyncMock(spec=ProductRepository)
     mock_product_repo.get_by_id.return_value = product
 
-    mock_redis = Mock()  # простой мок для Redis
-    mock_redis.setex = Mock()
-    mock_redis.delete = Mock()
-    mock_redis.get = Mock(return_value=None)
+    mock_redis = AsyncMock()  # асинхронный мок для Redis
+    mock_redis.get.return_value = None
 
     mock_service = ProductService(
         product_repository=mock_product_repo, redis_client=mock_redis
@@ -74,10 +74,8 @@ def test_get_products_by_filter(products: list[Product]):
     mock_product_repo = AsyncMock(spec=ProductRepository)
     mock_product_repo.get_by_filter.return_value = products
 
-    mock_redis = Mock()  # простой мок для Redis
-    mock_redis.setex = Mock()
-    mock_redis.delete = Mock()
-    mock_redis.get = Mock(return_value=None)
+    mock_redis = AsyncMock()  # асинхронный мок для Redis
+    mock_redis.get.return_value = None
 
     mock_service = ProductService(
         product_repository=mock_product_repo, redis_client=mock_redis
@@ -188,10 +186,8 @@ def test_get_products_by_filter_page(products10: list[Product]):
 
     mock_product_repo.get_by_filter.side_effect = fake_get_by_filter
 
-    mock_redis = Mock()  # простой мок для Redis
-    mock_redis.setex = Mock()
-    mock_redis.delete = Mock()
-    mock_redis.get = Mock(return_value=None)
+    mock_redis = AsyncMock()  # асинхронный мок для Redis
+    mock_redis.get.return_value = None
 
     mock_service = ProductService(
         product_repository=mock_product_repo, redis_client=mock_redis
@@ -217,3 +213,128 @@ def test_get_products_by_filter_page(products10: list[Product]):
         ids_page1 = {d["id"] for d in data}
         ids_page2 = {d["id"] for d in data2}
         assert ids_page1.isdisjoint(ids_page2)
+
+
+def test_export_products(products: list[Product]):
+    """Тест потоковой выгрузки продуктов в NDJSON"""
+
+    class FakeSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            return None
+
+        async def stream_scalars(self, query):
+            mock_result = Mock()
+
+            async def partitions():
+                yield products[:2]
+                yield products[2:]
+
+            mock_result.partitions = partitions
+            return mock_result
+
+    with create_test_client(
+        route_handlers=[ProductController],
+        dependencies={
+            "db_session_factory": Provide(lambda: FakeSession, sync_to_thread=False)
+        },
+    ) as client:
+        response = client.get("/products/export")
+        lines = response.text.splitlines()
+        assert response.status_code == HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert len(lines) == len(products)
+        assert json.loads(lines[2])["id"] == products[2].id
+
+
+def test_get_products_batch():
+    """Тест пакетного получения: кэш одним MGET, промахи одним запросом"""
+    products = [ProductFactory.build(id=i) for i in range(1, 4)]
+    cached, missed = products[0], products[1:]
+    mock_product_repo = AsyncMock(spec=ProductRepository)
+    mock_product_repo.get_many.return_value = missed
+
+    redis = FakeRedis(decode_responses=True)
+    mock_service = ProductService(
+        product_repository=mock_product_repo, redis_client=redis
+    )
+
+    with (
+        create_test_client(
+            route_handlers=[ProductController],
+            dependencies={
+                "product_service": Provide(lambda: mock_service, sync_to_thread=False)
+            },
+        ) as client,
+        client.portal() as portal,
+    ):
+        portal.call(redis.set, f"product:{cached.id}", cached.model_dump_json())
+
+        response = client.get("/products/batch?ids=1,0")
+        assert response.status_code == 400
+
+        response = client.get("/products/batch?ids=3,1,2,3,404")
+        assert response.status_code == HTTP_200_OK
+        assert [p["id"] for p in response.json()] == [3, 1, 2]
+        mock_product_repo.get_many.assert_awaited_once_with([3, 2, 404])
+        # промахи записаны в кэш
+        assert json.loads(portal.call(redis.get, "product:3"))["id"] == 3
+
+
+def test_bulk_products():
+    """Тест пакетной загрузки продуктов: JSON-массив и NDJSON"""
+    mock_product_repo = AsyncMock(spec=ProductRepository)
+    mock_product_repo.get_ids_by_names.return_value = {"B": 5}
+
+    async def fake_insert_many(rows, update):
+        # "B" уже есть в БД: без update вставка его пропускает
+        return {
+            row["product_name"]: (10 + i, row["product_name"] != "B", 1)
+            for i, row in enumerate(rows)
+            if update or row["product_name"] != "B"
+        }
+
+    mock_product_repo.insert_many.side_effect = fake_insert_many
+    mock_service = ProductService(
+        product_repository=mock_product_repo,
+        redis_client=FakeRedis(decode_responses=True),
+    )
+
+    with create_test_client(
+        route_handlers=[ProductController],
+        dependencies={
+            "product_service": Provide(lambda: mock_service, sync_to_thread=False)
+        },
+    ) as client:
+        response = client.post(
+            "/products/bulk",
+            json=[
+                {"product_name": "A", "quantity": 1},
+                {"product_name": "B", "quantity": 2},
+                {"product_name": "A", "quantity": 3},
+                {"product_name": "C", "quantity": -1},
+            ],
+        )
+        assert response.status_code == HTTP_200_OK
+        body = response.json()
+        assert [r["status"] for r in body["results"]] == [
+            "created",
+            "skipped",
+            "invalid",
+            "invalid",
+        ]
+        assert body["results"][0]["id"] == 10
+        assert body["created"] == 1 and body["invalid"] == 2
+
+        response = client.post(
+            "/products/bulk?on_conflict=update",
+            content=b'{"product_name":"B","quantity":7}\nnot json\n',
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == HTTP_200_OK
+        results = response.json()["results"]
+        assert results[0] == {"row": 0, "status": "updated", "id": 10}
+        assert results[1]["status"] == "invalid"
+        assert "Invalid JSON" in results[1]["detail"]
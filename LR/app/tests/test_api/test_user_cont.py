@@ -1,4 +1,4 @@
-from unittest.mock import AsyncMock, Mock
+from unittest.mock import AsyncMock
 
 import pytest
 from litestar.di import Provide
@@ -44,10 +44,8 @@ def test_get_user_by_id(user: User):
     mock_user_repo = AsyncMock(spec=UserRepository)
     mock_user_repo.get_by_id.return_value = user
 
-    mock_redis = Mock()  # простой мок для Redis
-    mock_redis.setex = Mock()
-    mock_redis.delete = Mock()
-    mock_redis.get = Mock(return_value=None)
+    mock_redis = AsyncMock()  # асинхронный мок для Redis
+    mock_redis.get.return_value = None
 
     mock_service = UserService(mock_user_repo, mock_redis)
 
@@ -73,10 +71,8 @@ def test_get_users_by_filter(users: list[User]):
     mock_user_repo = AsyncMock(spec=UserRepository)
     mock_user_repo.get_by_filter.return_value = users
 
-    mock_redis = Mock()  # простой мок для Redis
-    mock_redis.setex = Mock()
-    mock_redis.delete = Mock()
-    mock_redis.get = Mock(return_value=None)
+    mock_redis = AsyncMock()  # асинхронный мок для Redis
+    mock_redis.get.return_value = None
 
     mock_service = UserService(mock_user_repo, mock_redis)
 
@@ -169,3 +165,30 @@ def test_delete_user():
     ) as client:
         response = client.delete(f"/users/{old_user.id}")
         assert response.status_code == HTTP_204_NO_CONTENT
+
+
+def test_get_users_by_cursor(users: list[User]):
+    """Тест получения пользователей по курсору"""
+    mock_user_repo = AsyncMock(spec=UserRepository)
+    mock_user_repo.get_by_filter.return_value = users
+
+    mock_redis = AsyncMock()  # асинхронный мок для Redis
+    mock_service = UserService(mock_user_repo, mock_redis)
+
+    with create_test_client(
+        route_handlers=[UserController],
+        dependencies={
+            "user_service": Provide(lambda: mock_service, sync_to_thread=False)
+        },
+    ) as client:
+        response = client.get("/users?after=&count=3")
+        assert response.status_code == HTTP_200_OK
+        assert len(response.json()) == 3
+        assert mock_user_repo.get_by_filter.await_args.kwargs["after"] == 0
+
+        cursor = response.headers["X-Next-Cursor"]
+        client.get(f"/users?after={cursor}&count=3")
+        assert mock_user_repo.get_by_filter.await_args.kwargs["after"] == users[-1].id
+
+        response = client.get("/users?after=broken&count=3")
+        assert response.status_code == 400
@@ -0,0 +1,47 @@
+from datetime import date
+
+import pytest
+from LR.orm.db import Address, Order, OrderItem, Report
+from sqlalchemy import func, select, text
+
+
+async def query_plan(session, query) -> str:
+    """План SQLite для запроса (EXPLAIN QUERY PLAN)"""
+    compiled = query.compile(
+        dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}
+    )
+    result = await session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))
+    return " ".join(row[-1] for row in result)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "query, index",
+    [
+        # /orders/u/{user_id}
+        (select(Order).where(Order.user_id == 1), "ix_orders_user_id"),
+        # selectinload(Order.items)
+        (
+            select(OrderItem).where(OrderItem.order_id.in_([1, 2, 3])),
+            "ix_order_items_order_id",
+        ),
+        (
+            select(OrderItem).where(OrderItem.product_id == 1),
+            "ix_order_items_product_id",
+        ),
+        (select(Address).where(Address.user_id == 1), "ix_addresses_user_id"),
+        # ReportController.get_report
+        (
+            select(Report).where(Report.report_at == date(2025, 12, 1)),
+            "uq_reports_report_at_order_id",
+        ),
+        # ReportRepository.build_incremental
+        (select(func.max(Report.order_id)), "ix_reports_order_id"),
+    ],
+)
+async def test_query_uses_index(session, query, index):
+    """Тест: частые запросы используют индекс, а не полный просмотр"""
+    plan = await query_plan(session, query)
+
+    assert index in plan
+    assert not plan.startswith("SCAN")
@@ -3,6 +3,7 @@ from LR.app.repositories.order_repository import OrderRepository
 from LR.app.repositories.product_repository import ProductRepository
 from LR.app.repositories.user_repository import UserRepository
 from LR.orm.model import OrderCreate, OrderUpdate, ProductCreate, UserCreate
+from sqlalchemy import event
 
 
 class TestOrderRepository:
@@ -164,3 +165,42 @@ class TestOrderRepository:
         await order_repository.delete(1)
         found_order = await order_repository.get_by_id(1)
         assert found_order is None
+
+    @pytest.mark.asyncio
+    async def test_order_create_bulk(
+        self,
+        engine,
+        order_repository: OrderRepository,
+        user_repository: UserRepository,
+        product_repository: ProductRepository,
+    ):
+        """Тест: заказ и все позиции вставляются двумя запросами без SELECT"""
+
+        await user_repository.create(
+            UserCreate(username="Alex", email="email", description="")
+        )
+        for i in range(3):
+            await product_repository.create(
+                ProductCreate(product_name=f"Product{i}", quantity=10)
+            )
+
+        statements = []
+
+        def remember(conn, cursor, statement, *args):
+            statements.append(statement.split()[0].upper())
+
+        event.listen(engine.sync_engine, "before_cursor_execute", remember)
+        try:
+            order = await order_repository.create(
+                OrderCreate(
+                    user_id=1,
+                    items=[{"product_id": i + 1, "quantity": i + 1} for i in range(3)],
+                )
+            )
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", remember)
+
+        assert statements == ["INSERT", "INSERT"]
+        assert [item.product_id for item in order.items] == [1, 2, 3]
+        assert [item.quantity for item in order.items] == [1, 2, 3]
+        assert len({item.id for item in order.items}) == 3
@@ -1,6 +1,10 @@
+import json
+
 import pytest
+from LR.app.ndjson import ndjson_rows
 from LR.app.repositories.product_repository import ProductRepository
-from LR.orm.model import ProductCreate, ProductUpdate
+from LR.orm.model import ProductCreate, ProductResponse, ProductUpdate
+from sqlalchemy.exc import IntegrityError
 
 
 class TestProductRepository:
@@ -87,3 +91,110 @@ class TestProductRepository:
         await product_repository.delete(1)
         found_product = await product_repository.get_by_id(1)
         assert found_product is None
+
+    @pytest.mark.asyncio
+    async def test_product_get_many(self, product_repository: ProductRepository):
+        """Тест получения нескольких продуктов одним запросом"""
+
+        for i in range(3):
+            await product_repository.create(
+                ProductCreate(product_name=f"Test_Product{i}", quantity=i)
+            )
+
+        found_products = await product_repository.get_many([1, 3, 42])
+
+        assert sorted(product.id for product in found_products) == [1, 3]
+        assert await product_repository.get_many([]) == []
+
+    @pytest.mark.asyncio
+    async def test_product_get_after(self, product_repository: ProductRepository):
+        """Тест постраничного получения продуктов по курсору (keyset)"""
+
+        for i in range(5):
+            await product_repository.create(
+                ProductCreate(product_name=f"Test_Product{i}", quantity=i)
+            )
+
+        first = await product_repository.get_by_filter(count=2, after=0)
+        second = await product_repository.get_by_filter(count=2, after=first[-1].id)
+        last = await product_repository.get_by_filter(count=2, after=4)
+
+        assert [product.id for product in first] == [1, 2]
+        assert [product.id for product in second] == [3, 4]
+        assert [product.id for product in last] == [5]
+
+    @pytest.mark.asyncio
+    async def test_product_stream_all(
+        self, session, product_repository: ProductRepository
+    ):
+        """Тест потоковой выгрузки продуктов в NDJSON"""
+
+        for i in range(5):
+            await product_repository.create(
+                ProductCreate(product_name=f"Test_Product{i}", quantity=i)
+            )
+
+        chunks = [
+            chunk
+            async for chunk in ndjson_rows(
+                lambda: session,
+                lambda s: ProductRepository(s).stream_all(chunk_size=2),
+                ProductResponse,
+            )
+        ]
+        rows = [json.loads(line) for line in b"".join(chunks).splitlines()]
+
+        assert len(chunks) == 3
+        assert [row["id"] for row in rows] == [1, 2, 3, 4, 5]
+        assert rows[4]["product_name"] == "Test_Product4"
+
+    @pytest.mark.asyncio
+    async def test_product_insert_many(self, product_repository: ProductRepository):
+        """Тест многострочной вставки с ON CONFLICT по названию"""
+
+        await product_repository.create(
+            ProductCreate(product_name="Test_Product1", quantity=1)
+        )
+
+        rows = [
+            {"product_name": "Test_Product1", "quantity": 10},
+            {"product_name": "Test_Product2", "quantity": 20},
+        ]
+        written = await product_repository.insert_many(rows)
+        assert list(written) == ["Test_Product2"]
+        product_id, created, version = written["Test_Product2"]
+        assert created and version == 1
+        assert await product_repository.get_ids_by_names(
+            ["Test_Product1", "Test_Product2", "Missing"]
+        ) == {"Test_Product1": 1, "Test_Product2": product_id}
+
+        rows.append({"product_name": "Test_Product3", "quantity": 30})
+        written = await product_repository.insert_many(rows, update=True)
+        # обновлённые строки получают новую версию
+        assert written["Test_Product1"] == (1, False, 2)
+        assert written["Test_Product2"] == (product_id, False, 2)
+        assert written["Test_Product3"][1:] == (True, 1)
+        product = await product_repository.get_by_id(1)
+        await product_repository.session.refresh(product)
+        assert product.quantity == 10
+
+    @pytest.mark.asyncio
+    async def test_product_name_unique(self, product_repository: ProductRepository):
+        """Тест: занятое название отклоняет сама БД при вставке и переименовании"""
+
+        product_data = ProductCreate(product_name="Test_Product", quantity=8)
+        assert (await product_repository.create(product_data)).id == 1
+        assert await product_repository.create(product_data) is None
+
+        await product_repository.create(
+            ProductCreate(product_name="Test_Product2", quantity=1)
+        )
+        with pytest.raises(IntegrityError):
+            await product_repository.update(
+                2, ProductUpdate(product_name="Test_Product")
+            )
+        renamed = await product_repository.update(
+            2, ProductUpdate(product_name="Test_Product3")
+        )
+        assert renamed.product_name == "Test_Product3"
+        assert renamed.version == 2
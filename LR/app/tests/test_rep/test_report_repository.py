@@ -0,0 +1,142 @@
+from datetime import date
+
+import pytest
+from LR.app.repositories.order_repository import OrderRepository
+from LR.app.repositories.report_repository import ReportRepository
+from LR.app.repositories.user_repository import UserRepository
+from LR.orm.db import Report
+from LR.orm.model import OrderCreate, OrderUpdate, UserCreate
+from sqlalchemy import delete
+
+
+class TestReportRepository:
+
+    @pytest.mark.asyncio
+    async def test_report_build(
+        self,
+        session,
+        order_repository: OrderRepository,
+        user_repository: UserRepository,
+    ):
+        """Тест формирования отчёта одним запросом"""
+
+        await user_repository.create(
+            UserCreate(username="Alex", email="email", description="")
+        )
+        await order_repository.create(
+            OrderCreate(
+                user_id=1,
+                items=[
+                    {"product_id": 1, "quantity": 2},
+                    {"product_id": 2, "quantity": 3},
+                ],
+            )
+        )
+        await order_repository.create(
+            OrderCreate(user_id=1, items=[{"product_id": 1, "quantity": 1}])
+        )
+
+        report_repository = ReportRepository(session)
+        today = date(2025, 12, 1)
+
+        assert await report_repository.build(today) == 2
+        # повторный запуск за ту же дату не дублирует строки
+        assert await report_repository.build(today) == 2
+
+        reports = await report_repository.get_by_date(today)
+        totals = {report.order_id: report.count_product for report in reports}
+        assert totals == {1: 5, 2: 1}
+
+    @pytest.mark.asyncio
+    async def test_report_build_incremental(
+        self,
+        session,
+        order_repository: OrderRepository,
+        user_repository: UserRepository,
+    ):
+        """Тест: инкрементальный отчёт добавляет только новые заказы"""
+
+        await user_repository.create(
+            UserCreate(username="Alex", email="email", description="")
+        )
+        await order_repository.create(
+            OrderCreate(user_id=1, items=[{"product_id": 1, "quantity": 2}])
+        )
+
+        report_repository = ReportRepository(session)
+        assert await report_repository.build_incremental(date(2025, 12, 1)) == 1
+
+        await order_repository.create(
+            OrderCreate(user_id=1, items=[{"product_id": 1, "quantity": 4}])
+        )
+        assert await report_repository.build_incremental(date(2025, 12, 2)) == 1
+        assert await report_repository.build_incremental(date(2025, 12, 2)) == 0
+
+        reports = await report_repository.get_by_date(date(2025, 12, 2))
+        assert [(r.order_id, r.count_product) for r in reports] == [(2, 4)]
+
+    @pytest.mark.asyncio
+    async def test_report_build_incremental_late_commit(
+        self,
+        session,
+        order_repository: OrderRepository,
+        user_repository: UserRepository,
+    ):
+        """Тест: заказ, зафиксированный позже заказа с большим id,
+        попадает в следующий инкрементальный отчёт"""
+
+        await user_repository.create(
+            UserCreate(username="Alex", email="email", description="")
+        )
+        for quantity in (1, 2, 3):
+            await order_repository.create(
+                OrderCreate(user_id=1, items=[{"product_id": 1, "quantity": quantity}])
+            )
+        report_repository = ReportRepository(session)
+        assert await report_repository.build_incremental(date(2025, 12, 1)) == 3
+        # заказ 2 ещё не был виден, когда строился отчёт
+        await session.execute(delete(Report).where(Report.order_id == 2))
+        await session.commit()
+
+        assert await report_repository.build_incremental(date(2025, 12, 1), lag=0) == 0
+        assert await report_repository.build_incremental(date(2025, 12, 2)) == 1
+        assert await report_repository.build_incremental(date(2025, 12, 2)) == 0
+
+        reports = await report_repository.get_by_date(date(2025, 12, 2))
+        assert [(r.order_id, r.count_product) for r in reports] == [(2, 2)]
+
+    @pytest.mark.asyncio
+    async def test_order_repository_rollup(
+        self, session, user_repository: UserRepository
+    ):
+        """Тест: строка отчёта ведётся вместе с заказом"""
+
+        await user_repository.create(
+            UserCreate(username="Alex", email="email", description="")
+        )
+        report_repository = ReportRepository(session)
+        order_repository = OrderRepository(session, report_repository)
+
+        await order_repository.create(
+            OrderCreate(
+                user_id=1,
+                items=[
+                    {"product_id": 1, "quantity": 2},
+                    {"product_id": 2, "quantity": 3},
+                ],
+            )
+        )
+
+        reports = await report_repository.get_by_date(date.today())
+        assert [(r.order_id, r.count_product) for r in reports] == [(1, 5)]
+
+        # изменение заказа обновляет ту же строку, а не добавляет новую
+        await order_repository.update(
+            1,
+            OrderUpdate(
+                items=[{"id": 1, "quantity": 4}, {"product_id": 3, "quantity": 1}]
+            ),
+        )
+        session.expire_all()  # строки отчёта перечитываются из БД
+        reports = await report_repository.get_by_date(date.today())
+        assert [(r.order_id, r.count_product) for r in reports] == [(1, 8)]
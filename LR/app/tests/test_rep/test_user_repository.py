@@ -72,6 +72,34 @@ class TestUserRepository:
         assert found_user[1].email == "test2_email@example.com"
         assert found_user[1].description == ""
 
+    @pytest.mark.asyncio
+    async def test_user_get_many(self, user_repository: UserRepository):
+        """Тест получения пользователей по списку id одним запросом"""
+
+        for i in (1, 2, 3):
+            await user_repository.create(
+                UserCreate(
+                    username=f"Test_User{i}",
+                    email=f"test{i}_email@example.com",
+                    description="",
+                )
+            )
+
+        found_users = await user_repository.get_many([3, 1, 404])
+
+        assert sorted(user.id for user in found_users) == [1, 3]
+        assert await user_repository.get_many([]) == []
+
+    @pytest.mark.asyncio
+    async def test_user_email_unique(self, user_repository: UserRepository):
+        """Тест: занятый email отклоняет сама БД"""
+
+        user_data = UserCreate(
+            username="Test_User", email="test_email@example.com", description=""
+        )
+        assert (await user_repository.create(user_data)).id == 1
+        assert await user_repository.create(user_data) is None
+
     @pytest.mark.asyncio
     async def test_user_update(self, user_repository: UserRepository):
         """Тест обновления пользователя"""
@@ -94,6 +122,7 @@ class TestUserRepository:
         assert found_user.username == update_user.username
         assert found_user.email == update_user.email
         assert found_user.description == update_user.description
+        assert update_user.version == 2
 
     @pytest.mark.asyncio
     async def test_user_delete(self, user_repository: UserRepository):
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from LR.app.batching import FAILED, OK, REJECTED, MessageBatcher, apply_batch
+from LR.app.repositories.product_repository import ProductRepository
+from LR.orm.db import Product
+
+
+class TestMessageBatcher:
+    @pytest.mark.asyncio
+    async def test_flush_by_size_and_time(self):
+        """Тест: пачка уходит при наборе max_size или по истечении max_wait"""
+        batches = []
+
+        async def handle_batch(batch):
+            batches.append(batch)
+
+        batcher = MessageBatcher(handle_batch, max_size=3, max_wait=0.01)
+        for i in range(4):
+            await batcher.add(i)
+
+        assert batches == [[0, 1, 2]]
+        await asyncio.sleep(0.05)
+        assert batches == [[0, 1, 2], [3]]
+        assert batcher.processed == 4
+
+
+class TestApplyBatch:
+    @pytest.mark.asyncio
+    async def test_one_transaction_with_per_message_outcome(
+        self, engine, product_repository: ProductRepository
+    ):
+        """Тест: ошибка одного сообщения откатывает только его"""
+
+        async def apply(session, body):
+            # изменения уже во flush, затем отказ - как в OrderService
+            session.add(Product(**body))
+            await session.flush()
+            if body["quantity"] < 0:
+                raise ValueError("negative quantity")
+            if body["product_name"] == "fail":
+                raise RuntimeError("boom")
+
+        outcomes = await apply_batch(
+            engine,
+            [
+                {"product_name": "A", "quantity": 1},
+                {"product_name": "B", "quantity": -1},
+                {"product_name": "fail", "quantity": 1},
+                {"product_name": "C", "quantity": 2},
+            ],
+            apply,
+        )
+
+        assert outcomes == [OK, REJECTED, FAILED, OK]
+        products = await product_repository.get_by_filter()
+        assert [p.product_name for p in products] == ["A", "C"]
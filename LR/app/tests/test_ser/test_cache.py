@@ -0,0 +1,356 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+from LR.app.cache import (
+    DELETED_VERSION,
+    INVALIDATION_CHANNEL,
+    CacheWriteBuffer,
+    ListCache,
+    LocalCache,
+    SingleFlight,
+)
+from LR.app.repositories.product_repository import ProductRepository
+from LR.app.services.product_service import ProductService
+from LR.orm.model import ProductCreate, ProductResponse, ProductUpdate
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+
+class TestLocalCache:
+    def test_lru_eviction(self):
+        """Тест вытеснения самого старого ключа"""
+        cache = LocalCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    def test_ttl_and_stats(self):
+        """Тест истечения TTL и счётчиков попаданий"""
+        cache = LocalCache(maxsize=10, ttl=-1)
+        cache.set("a", 1)
+
+        assert cache.get("a") is None
+        cache.ttl = 60
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+
+class TestProductServiceLocalCache:
+    @pytest.mark.asyncio
+    async def test_local_hit_skips_redis(self):
+        """Тест: повторное чтение берётся из L1 без Redis и БД"""
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        mock_product_repo.get_by_id.return_value = Mock(
+            id=1, product_name="Product1", quantity=1
+        )
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+
+        product_service = ProductService(mock_product_repo, mock_redis, LocalCache())
+
+        await product_service.get_by_id(1)
+        redis_reads = mock_redis.get.await_count  # значение и его версия
+        result = await product_service.get_by_id(1)
+
+        assert result.product_name == "Product1"
+        assert mock_redis.get.await_count == redis_reads
+        assert mock_product_repo.get_by_id.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_update_publishes_invalidation(self):
+        """Тест: обновление удаляет ключ из L1 и оповещает другие процессы"""
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        redis = FakeRedis(decode_responses=True)
+        await redis.set("product:1", "{}")
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(INVALIDATION_CHANNEL)
+        local_cache = LocalCache()
+        local_cache.set("product:1", Mock())
+
+        mock_product_repo.update.return_value = Mock(
+            id=1, product_name="New", quantity=2, version=2
+        )
+        product_service = ProductService(mock_product_repo, redis, local_cache)
+        await product_service.update(1, ProductUpdate(product_name="New", quantity=2))
+
+        assert local_cache.get("product:1") is None
+        assert await redis.exists("product:1") == 0
+        # первым get_message пропускается подтверждение подписки
+        messages = [await pubsub.get_message(timeout=0.1) for _ in range(2)]
+        assert [m["data"] for m in messages if m] == ["product:1"]
+        await pubsub.aclose()
+
+
+class TestListCache:
+    @pytest.mark.asyncio
+    async def test_page_cached_with_cursor(self):
+        """Тест: страница и курсор отдаются из кэша без повторной загрузки"""
+        list_cache = ListCache(FakeRedis(decode_responses=True), "products")
+        load = AsyncMock(return_value=(b'[{"id":1}]', "aWQ6MQ"))
+
+        first = await list_cache.get_or_load(load, count=1, after=0)
+        second = await list_cache.get_or_load(load, count=1, after=0)
+
+        assert first == second == (b'[{"id":1}]', "aWQ6MQ")
+        assert load.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_page_reader_after_write(self):
+        """Тест: страница, прочитанная из БД до изменения, не попадает в кэш"""
+        redis = FakeRedis(decode_responses=True)
+        list_cache = ListCache(redis, "products")
+        loaded, written = asyncio.Event(), asyncio.Event()
+
+        async def slow_load():
+            loaded.set()
+            await written.wait()  # пока читаем, продукты изменились
+            return b"[]", None
+
+        reader = asyncio.create_task(list_cache.get_or_load(slow_load, page=1))
+        await loaded.wait()
+        writes = CacheWriteBuffer(redis)
+        writes.invalidate_lists("products")
+        await writes.flush()
+        written.set()
+
+        assert await reader == (b"[]", None)
+        assert await redis.exists(list_cache.key(page=1), "tag:products") == 0
+
+    @pytest.mark.asyncio
+    async def test_product_write_drops_pages(self):
+        """Тест: создание продукта удаляет все закэшированные страницы"""
+        redis = FakeRedis(decode_responses=True)
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        mock_product_repo.get_by_filter.return_value = [
+            ProductResponse(id=1, product_name="Product1", quantity=1)
+        ]
+        mock_product_repo.create.return_value = Mock(
+            id=2, product_name="Product2", quantity=2, version=1
+        )
+        product_service = ProductService(
+            mock_product_repo, redis, list_cache=ListCache(redis, "products")
+        )
+
+        body, _ = await product_service.get_page(count=10, page=1)
+        await product_service.get_page(count=10, page=2)
+        assert b'"product_name":"Product1"' in body
+        assert len(await redis.smembers("tag:products")) == 2
+
+        await product_service.create(ProductCreate(product_name="Product2", quantity=2))
+
+        assert await redis.exists("tag:products") == 0
+        # страница заново читается из БД
+        mock_product_repo.get_by_filter.return_value = []
+        assert await product_service.get_page(count=10, page=1) == (b"[]", None)
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_load_once(self):
+        """Тест: параллельные промахи по одному ключу - один запрос к БД"""
+
+        async def slow_get(product_id):
+            await asyncio.sleep(0.01)
+            return Mock(id=product_id, product_name="Product1", quantity=1)
+
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        mock_product_repo.get_by_id.side_effect = slow_get
+        flight = SingleFlight()
+        product_service = ProductService(
+            mock_product_repo, FakeRedis(decode_responses=True), flight=flight
+        )
+
+        bodies = await asyncio.gather(
+            *(product_service.get_json_by_id(1) for _ in range(100))
+        )
+
+        assert len(set(bodies)) == 1
+        mock_product_repo.get_by_id.assert_awaited_once_with(1)
+        assert flight.stats() == {"loads": 1, "coalesced": 99, "in_flight": 0}
+
+    @pytest.mark.asyncio
+    async def test_shared_load_survives_first_cancel(self, engine, product_repository):
+        """Тест: общая загрузка идёт в своей сессии, отмена первого запроса
+        не ломает ожидающих"""
+        await product_repository.create(ProductCreate(product_name="Hot", quantity=1))
+        request_repo = AsyncMock(spec=ProductRepository)
+        request_repo.get_by_id.side_effect = RuntimeError("session closed")
+        product_service = ProductService(
+            request_repo,
+            FakeRedis(decode_responses=True),
+            flight=SingleFlight(),
+            session_factory=sessionmaker(
+                engine, class_=AsyncSession, expire_on_commit=False
+            ),
+        )
+
+        first = asyncio.create_task(product_service.get_json_by_id(1))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(product_service.get_json_by_id(1)) for _ in range(5)
+        ]
+        first.cancel()
+        bodies = await asyncio.gather(*waiters)
+
+        assert all(b'"product_name":"Hot"' in body for body in bodies)
+        request_repo.get_by_id.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_early_refresh_near_expiry(self):
+        """Тест: ключ перед истечением обновляется заранее (XFetch)"""
+        redis = FakeRedis(decode_responses=True)
+        await redis.setex("product:1", 1, '{"id":1,"product_name":"Old","quantity":1}')
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        mock_product_repo.get_by_id.return_value = Mock(
+            id=1, product_name="New", quantity=1
+        )
+        flight = SingleFlight(early_refresh=1.0)
+        flight.load_time = 100.0  # загрузка дольше остатка TTL - обновить сразу
+        product_service = ProductService(mock_product_repo, redis, flight=flight)
+
+        product = await product_service.get_by_id(1)
+
+        assert product.product_name == "New"
+        assert await redis.ttl("product:1") > 1
+
+
+class TestCacheWriteBuffer:
+    @pytest.mark.asyncio
+    async def test_shared_buffer_writes_after_flush(self):
+        """Тест: с общим буфером сервис ничего не пишет в Redis до flush()"""
+        redis = FakeRedis(decode_responses=True)
+        await redis.set("product:1", "{}")
+        await redis.sadd("tag:products", "list:products:count=10&page=1")
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        mock_product_repo.create.return_value = Mock(
+            id=2, product_name="Product2", quantity=2, version=1
+        )
+        buffer = CacheWriteBuffer(redis)
+        product_service = ProductService(
+            mock_product_repo,
+            redis,
+            list_cache=ListCache(redis, "products"),
+            cache_buffer=buffer,
+        )
+
+        mock_product_repo.update.return_value = Mock(
+            id=1, product_name="New", quantity=2, version=2
+        )
+        await product_service.update(1, ProductUpdate(product_name="New", quantity=2))
+        await product_service.create(ProductCreate(product_name="Product2", quantity=2))
+        assert await redis.exists("product:1", "tag:products") == 2
+        assert await redis.exists("product:2") == 0
+
+        await buffer.flush()
+
+        assert await redis.exists("product:1", "tag:products") == 0
+        assert await redis.ttl("product:2") > 0
+
+    @pytest.mark.asyncio
+    async def test_merge_keeps_last_write(self):
+        """Тест: из нескольких записей по ключу остаётся последняя"""
+        redis = FakeRedis(decode_responses=True)
+        local_cache = LocalCache()
+        local_cache.set("user:1", b"old")
+        first, second = CacheWriteBuffer(redis), CacheWriteBuffer(redis)
+        first.set("user:1", 60, "old")
+        second.invalidate("user:1", local_cache)
+        second.set("user:2", 60, "new")
+
+        second.merge_into(first)
+        await first.flush()
+
+        assert await redis.get("user:1") is None
+        assert await redis.get("user:2") == "new"
+        assert local_cache.get("user:1") is None
+
+
+class TestWriteThrough:
+    @pytest.mark.asyncio
+    async def test_update_refreshes_key(self):
+        """Тест: после изменения ключ содержит новое значение, чтение без БД"""
+        redis = FakeRedis(decode_responses=True)
+        await redis.set("product:1", '{"id":1,"product_name":"Old","quantity":1}')
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        mock_product_repo.update.return_value = Mock(
+            id=1, product_name="New", quantity=2, version=2
+        )
+        product_service = ProductService(mock_product_repo, redis, write_through=True)
+
+        await product_service.update(1, ProductUpdate(product_name="New", quantity=2))
+        product = await product_service.get_by_id(1)
+
+        assert product.product_name == "New"
+        mock_product_repo.get_by_id.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_slow_reader_keeps_newer_value(self):
+        """Тест: читатель, загрузивший данные до изменения, не затирает новое"""
+        redis = FakeRedis(decode_responses=True)
+        loaded, updated = asyncio.Event(), asyncio.Event()
+
+        async def slow_get(product_id):
+            loaded.set()
+            await updated.wait()  # пока читаем, запись успели изменить
+            return Mock(id=product_id, product_name="Old", quantity=1)
+
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        mock_product_repo.get_by_id.side_effect = slow_get
+        mock_product_repo.update.return_value = Mock(
+            id=1, product_name="New", quantity=2, version=2
+        )
+        product_service = ProductService(mock_product_repo, redis, write_through=True)
+
+        reader = asyncio.create_task(product_service.get_by_id(1))
+        await loaded.wait()
+        await product_service.update(1, ProductUpdate(product_name="New", quantity=2))
+        updated.set()
+
+        assert (await reader).product_name == "Old"
+        cached = await redis.get("product:1")
+        assert ProductResponse.model_validate_json(cached).product_name == "New"
+
+    @pytest.mark.asyncio
+    async def test_late_flush_keeps_newer_write(self):
+        """Тест: сброс более ранней транзакции, пришедший в Redis последним,
+        не затирает значение более поздней"""
+        redis = FakeRedis(decode_responses=True)
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        mock_product_repo.update.side_effect = [
+            Mock(id=1, product_name="First", quantity=1, version=2),
+            Mock(id=1, product_name="Second", quantity=1, version=3),
+        ]
+        first, second = CacheWriteBuffer(redis), CacheWriteBuffer(redis)
+        for buffer, name in ((first, "First"), (second, "Second")):
+            product_service = ProductService(
+                mock_product_repo, redis, cache_buffer=buffer, write_through=True
+            )
+            await product_service.update(1, ProductUpdate(product_name=name))
+
+        await second.flush()
+        await first.flush()
+
+        cached = await redis.get("product:1")
+        assert ProductResponse.model_validate_json(cached).product_name == "Second"
+
+    @pytest.mark.asyncio
+    async def test_late_flush_after_delete(self):
+        """Тест: опоздавшая запись не возвращает в кэш удалённую строку"""
+        redis = FakeRedis(decode_responses=True)
+        update, delete = CacheWriteBuffer(redis), CacheWriteBuffer(redis)
+        update.set("product:1", 60, "old", version=5)
+        delete.invalidate("product:1", version=DELETED_VERSION)
+
+        await delete.flush()
+        await update.flush()
+
+        assert await redis.get("product:1") is None
@@ -0,0 +1,52 @@
+import pytest
+from LR.app import codec
+from LR.orm.model import OrderCreate
+
+ORDER = {
+    "action": "create",
+    "user_id": 3,
+    "address_id": None,
+    "items": [{"product_id": i, "quantity": i % 5 + 1} for i in range(1, 101)],
+}
+
+
+class TestCodec:
+    @pytest.mark.parametrize(
+        "content_type", [codec.JSON, codec.MSGPACK, codec.ORDER_STRUCT]
+    )
+    def test_round_trip(self, content_type):
+        """Тест: сообщение о заказе одинаково проходит через каждый кодек"""
+        if content_type not in codec.codecs:
+            pytest.skip("msgpack is not installed")
+
+        body = codec.encode(ORDER, content_type)
+
+        assert codec.decode(body, content_type) == ORDER
+        assert OrderCreate(**codec.decode(body, content_type)).items[99].quantity == 1
+
+    def test_struct_is_compact(self):
+        """Тест: фиксированная схема компактнее JSON"""
+        json_body = codec.encode(ORDER)
+        struct_body = codec.encode(ORDER, codec.ORDER_STRUCT)
+
+        assert len(struct_body) == 12 + 8 * len(ORDER["items"])
+        assert len(struct_body) < len(json_body) / 2
+
+    def test_missing_content_type_is_json(self):
+        """Тест: сообщения без content-type читаются как JSON"""
+        assert codec.decode(b'{"action": "create"}', None) == {"action": "create"}
+
+    def test_errors(self):
+        """Тест: неизвестный формат и битое тело - ValueError"""
+        with pytest.raises(ValueError, match="Unsupported content type"):
+            codec.decode(b"", "text/csv")
+        with pytest.raises(ValueError, match="Malformed order message"):
+            codec.decode(b"\x01\x00", codec.ORDER_STRUCT)
+        with pytest.raises(ValueError, match="fixed schema"):
+            codec.encode({"action": "update", "id": 1}, codec.ORDER_STRUCT)
+        for quantity in (-1, 2**32):
+            message = {"user_id": 1, "items": [{"product_id": 1, "quantity": quantity}]}
+            with pytest.raises(ValueError, match="does not fit the schema"):
+                codec.encode(message, codec.ORDER_STRUCT)
+        with pytest.raises(TypeError):
+            codec.Codec()  # pylint: disable=abstract-class-instantiated
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from LR.app.concurrency import LaneExecutor
+
+
+class TestLaneExecutor:
+    @pytest.mark.asyncio
+    async def test_order_per_key_and_bounded_parallelism(self):
+        """Тест: порядок внутри ключа сохраняется, параллельно не больше полос"""
+        processed = []
+        running = 0
+        max_running = 0
+
+        async def handle(item):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.001)
+            processed.append(item)
+            running -= 1
+
+        executor = LaneExecutor(handle, lanes=3)
+        for i in range(10):
+            for user_id in range(5):
+                await executor.submit(user_id, (user_id, i))
+        await executor.close()
+
+        assert len(processed) == 50
+        assert 1 < max_running <= 3
+        for user_id in range(5):
+            assert [i for u, i in processed if u == user_id] == list(range(10))
+
+    @pytest.mark.asyncio
+    async def test_error_does_not_stop_lane(self):
+        """Тест: ошибка в обработчике не останавливает полосу"""
+        processed = []
+
+        async def handle(item):
+            if item == 0:
+                raise RuntimeError("boom")
+            processed.append(item)
+
+        executor = LaneExecutor(handle, lanes=1)
+        for item in range(3):
+            await executor.submit("key", item)
+        await executor.close()
+
+        assert processed == [1, 2]
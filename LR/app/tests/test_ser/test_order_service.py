@@ -1,11 +1,22 @@
 from unittest.mock import AsyncMock, Mock
 
 import pytest
+from fakeredis.aioredis import FakeRedis
+from LR.app.cache import order_cache_stats
 from LR.app.repositories.order_repository import OrderRepository
 from LR.app.repositories.product_repository import ProductRepository
 from LR.app.repositories.user_repository import UserRepository
 from LR.app.services.order_service import OrderService
-from LR.orm.model import OrderCreate, OrderItemCreate
+from LR.orm.model import (
+    OrderCreate,
+    OrderItemCreate,
+    OrderItemResponse,
+    OrderItemUpdate,
+    OrderResponse,
+    OrderUpdate,
+    ProductCreate,
+    UserCreate,
+)
 
 
 class TestOrderService:
@@ -22,9 +33,9 @@ class TestOrderService:
         mock_user_repo.get_by_id.return_value = Mock(
             id=1, username="Test_User", email="email@example.com", description=""
         )
-        mock_product_repo.get_by_id.return_value = Mock(
-            id=1, product_name="Product1", quantity=1
-        )
+        mock_product_repo.get_many.return_value = [
+            Mock(id=1, product_name="Product1", quantity=1)
+        ]
         mock_order_repo.create.return_value = Mock(
             id=1, user_id=1, address_id=None, items=[Mock(product_id=1, quantity=1)]
         )
@@ -61,9 +72,9 @@ class TestOrderService:
 
         # Настраиваем моки
         mock_user_repo.get_by_id = AsyncMock(return_value=None)
-        mock_product_repo.get_by_id.return_value = Mock(
-            id=1, product_name="Product1", quantity=1
-        )
+        mock_product_repo.get_many.return_value = [
+            Mock(id=1, product_name="Product1", quantity=1)
+        ]
         mock_order_repo.create.return_value = Mock(
             id=1, user_id=1, address_id=None, items=[Mock(product_id=1, quantity=1)]
         )
@@ -96,7 +107,7 @@ class TestOrderService:
         mock_user_repo.get_by_id.return_value = Mock(
             id=1, username="Test_User", email="email@example.com", description=""
         )
-        mock_product_repo.get_by_id = AsyncMock(return_value=None)
+        mock_product_repo.get_many.return_value = []
         mock_order_repo.create.return_value = Mock(
             id=1, user_id=1, address_id=None, items=[Mock(product_id=1, quantity=1)]
         )
@@ -129,9 +140,9 @@ class TestOrderService:
         mock_user_repo.get_by_id.return_value = Mock(
             id=1, username="Test_User", email="email@example.com", description=""
         )
-        mock_product_repo.get_by_id.return_value = Mock(
-            id=1, product_name="Product1", quantity=1
-        )
+        mock_product_repo.get_many.return_value = [
+            Mock(id=1, product_name="Product1", quantity=1)
+        ]
         mock_order_repo.create.return_value = Mock(
             id=1, user_id=1, address_id=None, items=[Mock(product_id=1, quantity=2)]
         )
@@ -152,3 +163,180 @@ class TestOrderService:
             ValueError, match="Not enough stock for product 1 \(Product1\)"
         ):
             await order_service.create(order_data)
+
+    @pytest.mark.asyncio
+    async def test_create_order_sums_same_product(self):
+        """Тест: позиции с одним товаром проверяются по суммарному количеству"""
+
+        mock_order_repo = AsyncMock(spec=OrderRepository)
+        mock_user_repo = AsyncMock(spec=UserRepository)
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+
+        mock_user_repo.get_by_id.return_value = Mock(id=1)
+        mock_product_repo.get_many.return_value = [
+            Mock(id=1, product_name="Product1", quantity=3)
+        ]
+
+        order_service = OrderService(
+            order_repository=mock_order_repo,
+            user_repository=mock_user_repo,
+            product_repository=mock_product_repo,
+        )
+
+        order_data = OrderCreate(
+            user_id=1,
+            items=[
+                OrderItemCreate(product_id=1, quantity=2),
+                OrderItemCreate(product_id=1, quantity=2),
+            ],
+        )
+
+        with pytest.raises(ValueError, match="Not enough stock for product 1"):
+            await order_service.create(order_data)
+        mock_product_repo.get_many.assert_awaited_once_with([1], for_update=True)
+
+    @pytest.mark.asyncio
+    async def test_create_order_reserves_stock(
+        self,
+        order_repository: OrderRepository,
+        user_repository: UserRepository,
+        product_repository: ProductRepository,
+    ):
+        """Тест списания остатков при создании заказа"""
+
+        await user_repository.create(
+            UserCreate(username="Alex", email="email", description="")
+        )
+        await product_repository.create(ProductCreate(product_name="P1", quantity=5))
+
+        order_service = OrderService(
+            order_repository=order_repository,
+            user_repository=user_repository,
+            product_repository=product_repository,
+        )
+
+        order_data = OrderCreate(
+            user_id=1, items=[OrderItemCreate(product_id=1, quantity=3)]
+        )
+        await order_service.create(order_data)
+
+        product = (await product_repository.get_many([1], for_update=True))[0]
+        assert product.quantity == 2
+
+        with pytest.raises(ValueError, match="Not enough stock for product 1"):
+            await order_service.create(order_data)
+
+    @pytest.mark.asyncio
+    async def test_create_order_negative_quantity(
+        self,
+        order_repository: OrderRepository,
+        user_repository: UserRepository,
+        product_repository: ProductRepository,
+    ):
+        """Тест: позиция с неположительным количеством не меняет остаток"""
+
+        await user_repository.create(
+            UserCreate(username="Alex", email="email", description="")
+        )
+        await product_repository.create(ProductCreate(product_name="P1", quantity=5))
+
+        order_service = OrderService(
+            order_repository=order_repository,
+            user_repository=user_repository,
+            product_repository=product_repository,
+        )
+
+        for quantity in (-100, 0):
+            order_data = OrderCreate(
+                user_id=1, items=[OrderItemCreate(product_id=1, quantity=quantity)]
+            )
+            with pytest.raises(ValueError, match="must be positive"):
+                await order_service.create(order_data)
+
+        product = (await product_repository.get_many([1]))[0]
+        assert product.quantity == 5
+
+    @pytest.mark.asyncio
+    async def test_update_and_delete_order_move_stock(
+        self,
+        order_repository: OrderRepository,
+        user_repository: UserRepository,
+        product_repository: ProductRepository,
+    ):
+        """Тест: изменение заказа списывает разницу, удаление возвращает товар"""
+
+        await user_repository.create(
+            UserCreate(username="Alex", email="email", description="")
+        )
+        await product_repository.create(ProductCreate(product_name="P1", quantity=5))
+        await product_repository.create(ProductCreate(product_name="P2", quantity=5))
+
+        order_service = OrderService(
+            order_repository=order_repository,
+            user_repository=user_repository,
+            product_repository=product_repository,
+        )
+
+        async def stock():
+            products = await product_repository.get_many([1, 2], for_update=True)
+            return [product.quantity for product in products]
+
+        await order_service.create(
+            OrderCreate(user_id=1, items=[OrderItemCreate(product_id=1, quantity=1)])
+        )
+        assert await stock() == [4, 5]
+
+        with pytest.raises(ValueError, match="Not enough stock for product 1"):
+            await order_service.update(
+                1, OrderUpdate(items=[OrderItemUpdate(id=1, quantity=100)])
+            )
+        assert await stock() == [4, 5]
+
+        await order_service.update(
+            1,
+            OrderUpdate(
+                items=[
+                    OrderItemUpdate(id=1, quantity=3),
+                    OrderItemUpdate(product_id=2, quantity=2),
+                ]
+            ),
+        )
+        assert await stock() == [2, 3]
+
+        # позиция переходит на другой товар
+        await order_service.update(
+            1, OrderUpdate(items=[OrderItemUpdate(id=1, product_id=2)])
+        )
+        assert await stock() == [5, 0]
+
+        await order_service.delete(1)
+        assert await stock() == [5, 5]
+
+    @pytest.mark.asyncio
+    async def test_get_order_cached(self):
+        """Тест: повторный запрос заказа берётся из Redis, update сбрасывает кэш"""
+        mock_order_repo = AsyncMock(spec=OrderRepository)
+        mock_order_repo.get_by_id.return_value = OrderResponse(
+            id=1,
+            user_id=1,
+            address_id=None,
+            items=[OrderItemResponse(id=1, product_id=2, quantity=3)],
+        )
+        order_service = OrderService(
+            mock_order_repo,
+            AsyncMock(spec=UserRepository),
+            AsyncMock(spec=ProductRepository),
+            FakeRedis(decode_responses=True),
+        )
+        hits = order_cache_stats.hits
+
+        await order_service.get_by_id(1)
+        cached = await order_service.get_by_id(1)
+
+        assert cached == mock_order_repo.get_by_id.return_value
+        assert mock_order_repo.get_by_id.await_count == 1
+        assert order_cache_stats.hits == hits + 1
+
+        await order_service.update(1, OrderUpdate(address_id=None))
+        await order_service.get_by_id(1)
+        assert mock_order_repo.get_by_id.await_count == 2
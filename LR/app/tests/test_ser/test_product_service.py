@@ -1,9 +1,11 @@
 from unittest.mock import AsyncMock, Mock
 
 import pytest
+from fakeredis.aioredis import FakeRedis
 from LR.app.repositories.product_repository import ProductRepository
 from LR.app.services.product_service import ProductService
-from LR.orm.model import ProductCreate
+from LR.orm.model import ProductCreate, ProductUpdate
+from sqlalchemy.exc import IntegrityError
 
 
 class TestProductService:
@@ -15,18 +17,14 @@ class TestProductService:
         mock_product_repo = AsyncMock(spec=ProductRepository)
 
         # Настраиваем моки
-        mock_product_repo.get_by_filter.return_value = None
         mock_product_repo.create.return_value = Mock(
-            id=1, product_name="Product1", quantity=1
+            id=1, product_name="Product1", quantity=1, version=1
         )
 
-        mock_redis = Mock()  # простой мок для Redis
-        mock_redis.setex = Mock()
-        mock_redis.delete = Mock()
-        mock_redis.get = Mock(return_value=None)
+        redis = FakeRedis(decode_responses=True)
 
         product_service = ProductService(
-            product_repository=mock_product_repo, redis_client=mock_redis
+            product_repository=mock_product_repo, redis_client=redis
         )
 
         product_data = ProductCreate(product_name="Product1", quantity=1)
@@ -37,6 +35,7 @@ class TestProductService:
         assert result.id == 1
         assert result.product_name == "Product1"
         assert result.quantity == 1
+        assert await redis.ttl("product:1") > 0
 
     @pytest.mark.asyncio
     async def test_create_product_found_product(self):
@@ -45,16 +44,11 @@ class TestProductService:
         # Мокаем репозитории
         mock_product_repo = AsyncMock(spec=ProductRepository)
 
-        # Настраиваем моки
-        mock_product_repo.get_by_filter.return_value = Mock(
-            id=1, product_name="Product1", quantity=1
-        )
+        # Настраиваем моки: вставка не вернула строку - название занято
         mock_product_repo.create.return_value = None
 
-        mock_redis = Mock()  # простой мок для Redis
-        mock_redis.setex = Mock()
-        mock_redis.delete = Mock()
-        mock_redis.get = Mock(return_value=None)
+        mock_redis = AsyncMock()  # асинхронный мок для Redis
+        mock_redis.get.return_value = None
 
         product_service = ProductService(
             product_repository=mock_product_repo, redis_client=mock_redis
@@ -73,13 +67,10 @@ class TestProductService:
         mock_product_repo = AsyncMock(spec=ProductRepository)
 
         # Настраиваем моки
-        mock_product_repo.get_by_filter.return_value = None
         mock_product_repo.create.return_value = None
 
-        mock_redis = Mock()  # простой мок для Redis
-        mock_redis.setex = Mock()
-        mock_redis.delete = Mock()
-        mock_redis.get = Mock(return_value=None)
+        mock_redis = AsyncMock()  # асинхронный мок для Redis
+        mock_redis.get.return_value = None
 
         product_service = ProductService(
             product_repository=mock_product_repo, redis_client=mock_redis
@@ -89,3 +80,62 @@ class TestProductService:
 
         with pytest.raises(ValueError, match="The product cannot be a negative number"):
             await product_service.create(product_data)
+
+    @pytest.mark.asyncio
+    async def test_update_product_name_taken(self):
+        """Тест: занятое название при переименовании - та же ошибка, что при создании"""
+
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        mock_product_repo.update.side_effect = IntegrityError("UPDATE", {}, Exception())
+
+        product_service = ProductService(
+            product_repository=mock_product_repo,
+            redis_client=FakeRedis(decode_responses=True),
+        )
+
+        with pytest.raises(ValueError, match="With this product name already exists"):
+            await product_service.update(1, ProductUpdate(product_name="Product2"))
+
+    @pytest.mark.asyncio
+    async def test_update_product_quantity_only(self):
+        """Тест: изменение только остатка не проверяет название"""
+
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        mock_product_repo.update.return_value = Mock(
+            id=1, product_name="Product1", quantity=5, version=2
+        )
+
+        product_service = ProductService(
+            product_repository=mock_product_repo,
+            redis_client=FakeRedis(decode_responses=True),
+        )
+
+        result = await product_service.update(1, ProductUpdate(quantity=5))
+
+        assert result.quantity == 5
+        mock_product_repo.get_by_filter.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_bulk_failed_chunk_keeps_earlier_invalidations(self):
+        """Тест: ошибка в пачке не отменяет сброс кэша уже записанных пачек"""
+
+        mock_product_repo = AsyncMock(spec=ProductRepository)
+        mock_product_repo.get_ids_by_names.return_value = {}
+        mock_product_repo.insert_many.side_effect = [
+            {"A": (5, False, 2)},
+            RuntimeError("connection lost"),
+        ]
+        redis = FakeRedis(decode_responses=True)
+        await redis.set("product:5", '{"id": 5, "product_name": "A", "quantity": 1}')
+
+        product_service = ProductService(
+            product_repository=mock_product_repo, redis_client=redis
+        )
+
+        async def rows():
+            yield {"product_name": "A", "quantity": 7}
+            yield {"product_name": "B", "quantity": 1}
+
+        with pytest.raises(RuntimeError):
+            await product_service.bulk_upsert(rows(), update=True, chunk_size=1)
+        assert await redis.get("product:5") is None
@@ -1,6 +1,8 @@
 from unittest.mock import AsyncMock, Mock
 
 import pytest
+from fakeredis.aioredis import FakeRedis
+from LR.app.cache import LocalCache
 from LR.app.repositories.user_repository import UserRepository
 from LR.app.services.user_service import UserService
 from LR.orm.model import UserCreate
@@ -15,18 +17,16 @@ class TestUserService:
         mock_user_repo = AsyncMock(spec=UserRepository)
 
         # Настраиваем моки
-        mock_user_repo.get_by_filter.return_value = None
         mock_user_repo.create.return_value = Mock(
-            id=1, username="Test_User", email="email@example.com", description=""
+            id=1,
+            username="Test_User",
+            email="email@example.com",
+            description="",
+            version=1,
         )
-        mock_redis = Mock()  # простой мок для Redis
-        mock_redis.setex = Mock()
-        mock_redis.delete = Mock()
-        mock_redis.get = Mock(return_value=None)
+        redis = FakeRedis(decode_responses=True)
 
-        user_service = UserService(
-            user_repository=mock_user_repo, redis_client=mock_redis
-        )
+        user_service = UserService(user_repository=mock_user_repo, redis_client=redis)
 
         user_data = UserCreate(
             username="Test_User", email="email@example.com", description=""
@@ -38,6 +38,8 @@ class TestUserService:
         assert result.id == 1
         assert result.username == "Test_User"
         assert result.email == "email@example.com"
+        # после создания пользователь сразу лежит в кэше
+        assert await redis.ttl("user:1") > 0
 
     @pytest.mark.asyncio
     async def test_create_user_found_user(self):
@@ -46,16 +48,11 @@ class TestUserService:
         # Мокаем репозитории
         mock_user_repo = AsyncMock(spec=UserRepository)
 
-        # Настраиваем моки
-        mock_user_repo.get_by_filter.return_value = Mock(
-            id=1, username="Test_User", email="email@example.com", description=""
-        )
+        # Настраиваем моки: занятый email - вставка ничего не вернула
         mock_user_repo.create.return_value = None
 
-        mock_redis = Mock()  # простой мок для Redis
-        mock_redis.setex = Mock()
-        mock_redis.delete = Mock()
-        mock_redis.get = Mock(return_value=None)
+        mock_redis = AsyncMock()  # асинхронный мок для Redis
+        mock_redis.get.return_value = None
 
         user_service = UserService(
             user_repository=mock_user_repo, redis_client=mock_redis
@@ -69,3 +66,45 @@ class TestUserService:
             ValueError, match="User with this email address already exists"
         ):
             await user_service.create(user_data)
+        # проверка и вставка - один запрос
+        mock_user_repo.get_by_filter.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_get_user_from_cache(self):
+        """Тест получения пользователя из кэша без обращения к БД"""
+
+        mock_user_repo = AsyncMock(spec=UserRepository)
+
+        mock_redis = AsyncMock()  # асинхронный мок для Redis
+        mock_redis.get.return_value = (
+            '{"id": 1, "username": "Test_User", '
+            '"email": "email@example.com", "description": ""}'
+        )
+
+        user_service = UserService(
+            user_repository=mock_user_repo, redis_client=mock_redis
+        )
+
+        result = await user_service.get_by_id(1)
+
+        assert result.id == 1
+        assert result.username == "Test_User"
+        mock_redis.get.assert_awaited_once_with("user:1")
+        mock_user_repo.get_by_id.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_get_json_from_cache_as_is(self):
+        """Тест: JSON из кэша отдаётся без разбора и попадает в L1"""
+
+        mock_user_repo = AsyncMock(spec=UserRepository)
+        cached = '{"id":1,"username":"Test_User","email":"e@x","description":""}'
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = cached
+        local_cache = LocalCache()
+
+        user_service = UserService(mock_user_repo, mock_redis, local_cache=local_cache)
+
+        assert await user_service.get_json_by_id(1) == cached.encode()
+        assert await user_service.get_json_by_id(1) == cached.encode()
+        mock_redis.get.assert_awaited_once_with("user:1")
+        mock_user_repo.get_by_id.assert_not_called()
@@ -0,0 +1,40 @@
+"""add order_items
+
+Revision ID: 2a6d8c4e9b71
+Revises: d0019e2b1da0
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a6d8c4e9b71'
+down_revision: Union[str, Sequence[str], None] = 'd0019e2b1da0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # раньше таблицу создавал только create_all при старте приложения:
+    # в уже развёрнутых базах она есть, в новой - нет
+    if sa.inspect(op.get_bind()).has_table('order_items'):
+        return
+    op.create_table('order_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('order_items')
@@ -0,0 +1,45 @@
+"""add indexes
+
+Revision ID: 4b7e2f9c1a3d
+Revises: 2a6d8c4e9b71
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2f9c1a3d'
+down_revision: Union[str, Sequence[str], None] = '2a6d8c4e9b71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_addresses_user_id'), 'addresses', ['user_id'], unique=False)
+    op.create_index(op.f('ix_orders_user_id'), 'orders', ['user_id'], unique=False)
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+    op.create_index(op.f('ix_order_items_product_id'), 'order_items', ['product_id'], unique=False)
+    op.create_index(op.f('ix_reports_order_id'), 'reports', ['order_id'], unique=False)
+
+    # повторные запуски старого планировщика могли задвоить строки отчёта:
+    # оставляем первую строку для каждой пары (дата, заказ)
+    op.execute(sa.text(
+        "DELETE FROM reports WHERE id NOT IN "
+        "(SELECT MIN(id) FROM reports GROUP BY report_at, order_id)"
+    ))
+    op.create_index('uq_reports_report_at_order_id', 'reports', ['report_at', 'order_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_reports_report_at_order_id', table_name='reports')
+    op.drop_index(op.f('ix_reports_order_id'), table_name='reports')
+    op.drop_index(op.f('ix_order_items_product_id'), table_name='order_items')
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
+    op.drop_index(op.f('ix_orders_user_id'), table_name='orders')
+    op.drop_index(op.f('ix_addresses_user_id'), table_name='addresses')
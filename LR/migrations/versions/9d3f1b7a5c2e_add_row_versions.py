@@ -0,0 +1,30 @@
+"""add row versions
+
+Revision ID: 9d3f1b7a5c2e
+Revises: 4b7e2f9c1a3d
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f1b7a5c2e'
+down_revision: Union[str, Sequence[str], None] = '4b7e2f9c1a3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('products', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('products', 'version')
+    op.drop_column('users', 'version')
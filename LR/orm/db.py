@@ -1,5 +1,5 @@
 from datetime import date
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, declarative_base, mapped_column, relationship
 
 Base = declarative_base()
@@ -14,6 +14,8 @@ class User(Base):
     username: Mapped[str] = mapped_column(nullable=False, unique=False)
     email: Mapped[str] = mapped_column(nullable=False, unique=True)
     description: Mapped[str] = mapped_column(nullable=True)
+    # растёт при каждом изменении строки, см. CacheWriteBuffer
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
 
     address = relationship("Address", back_populates="user")
     orders = relationship("Order", back_populates="user")
@@ -25,7 +27,9 @@ class Address(Base):
     id: Mapped[int] = mapped_column(
         primary_key=True,
     )
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id"), nullable=False, index=True
+    )
     street: Mapped[str] = mapped_column(nullable=False)
     city: Mapped[str] = mapped_column(nullable=False)
     country: Mapped[str] = mapped_column(nullable=False)
@@ -38,7 +42,9 @@ class Order(Base):
     __tablename__ = "orders"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id"), nullable=False, index=True
+    )
     address_id: Mapped[int] = mapped_column(ForeignKey("addresses.id"), nullable=True)
 
     user = relationship("User", back_populates="orders")
@@ -52,8 +58,12 @@ class OrderItem(Base):
     __tablename__ = "order_items"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), nullable=False)
-    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), nullable=False)
+    order_id: Mapped[int] = mapped_column(
+        ForeignKey("orders.id"), nullable=False, index=True
+    )
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("products.id"), nullable=False, index=True
+    )
     quantity: Mapped[int] = mapped_column(nullable=False)
 
     order = relationship("Order", back_populates="items")
@@ -68,18 +78,27 @@ class Product(Base):
     )
     product_name: Mapped[str] = mapped_column(nullable=True, unique=True)
     quantity: Mapped[int] = mapped_column(nullable=True)
+    # растёт при каждом изменении строки, см. CacheWriteBuffer
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
 
     order_items = relationship("OrderItem", back_populates="product")
     
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        # одна строка на заказ за дату; индекс же ищет отчёт по дате
+        Index("uq_reports_report_at_order_id", "report_at", "order_id", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(
         primary_key=True,
     )
     report_at: Mapped[date] = mapped_column(nullable=False)
-    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), nullable=False)
+    # по нему ищется последний учтённый заказ (инкрементальный отчёт)
+    order_id: Mapped[int] = mapped_column(
+        ForeignKey("orders.id"), nullable=False, index=True
+    )
     count_product: Mapped[int] = mapped_column(nullable=False)
 
     order = relationship("Order")
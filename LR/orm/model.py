@@ -86,6 +86,7 @@ class OrderItemCreate(OrderItemBase):
 
 
 class OrderItemUpdate(BaseModel):
+    id: Optional[int] = None  # позиция заказа; без id - новая позиция
     product_id: Optional[int] = None
     quantity: Optional[int] = None
 
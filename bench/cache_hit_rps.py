@@ -0,0 +1,124 @@
+"""Запросы в секунду на попаданиях в кэш для /users/{id} и /products/{id}.
+
+Запуск из корня репозитория:
+    python -m bench.cache_hit_rps
+    python -m bench.cache_hit_rps --url http://localhost:8000
+
+In-process режим поднимает контроллеры с fakeredis, заранее заполненным
+JSON-ом сущностей, и сравнивает два пути ответа:
+"parse" - старый: JSON из Redis разбирается в модель и сериализуется снова,
+"raw" - текущий: байты из кэша отдаются как есть.
+Каждый путь меряется без локального кэша (L1) и с ним.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+from fakeredis.aioredis import FakeRedis
+from litestar import Controller, Litestar, get
+from litestar.di import Provide
+from LR.app.cache import LocalCache
+from LR.app.controllers.product_controller import ProductController
+from LR.app.controllers.user_controller import UserController
+from LR.app.services.product_service import ProductService
+from LR.app.services.user_service import UserService
+from LR.orm.model import ProductResponse, UserResponse
+
+
+class ParseController(Controller):
+    """Старый путь: модель из кэша и повторная сериализация ответа"""
+
+    @get("/users/{user_id:int}")
+    async def get_user(self, user_service: UserService, user_id: int) -> UserResponse:
+        user = await user_service.get_by_id(user_id)
+        return UserResponse.model_validate(user, from_attributes=True)
+
+    @get("/products/{product_id:int}")
+    async def get_product(
+        self, product_service: ProductService, product_id: int
+    ) -> ProductResponse:
+        product = await product_service.get_by_id(product_id)
+        return ProductResponse.model_validate(product, from_attributes=True)
+
+
+async def fill_redis(ids: int) -> FakeRedis:
+    redis = FakeRedis(decode_responses=True)
+    for n in range(1, ids + 1):
+        user = UserResponse(
+            id=n, username=f"user{n}", email=f"{n}@x", description="bench"
+        )
+        product = ProductResponse(id=n, product_name=f"product{n}", quantity=n)
+        await redis.set(f"user:{n}", user.model_dump_json())
+        await redis.set(f"product:{n}", product.model_dump_json())
+    return redis
+
+
+def build_app(redis, mode: str, local: bool) -> Litestar:
+    # репозитории не нужны: все запросы попадают в кэш
+    users = UserService(None, redis, local_cache=LocalCache() if local else None)
+    products = ProductService(None, redis, local_cache=LocalCache() if local else None)
+    handlers = (
+        [ParseController] if mode == "parse" else [UserController, ProductController]
+    )
+    return Litestar(
+        route_handlers=handlers,
+        dependencies={
+            "user_service": Provide(lambda: users, sync_to_thread=False),
+            "product_service": Provide(lambda: products, sync_to_thread=False),
+        },
+    )
+
+
+async def run_clients(client, path: str, clients: int, requests: int, ids: int):
+    async def worker(n: int):
+        for i in range(n, requests, clients):
+            response = await client.get(f"/{path}/{i % ids + 1}")
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(clients)))
+    return requests / (time.perf_counter() - start)
+
+
+async def bench_in_process(args):
+    redis = await fill_redis(args.ids)
+    for path in ("users", "products"):
+        for local in (False, True):
+            for mode in ("parse", "raw"):
+                app = build_app(redis, mode, local)
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(
+                    transport=transport, base_url="http://b"
+                ) as client:
+                    await run_clients(client, path, args.clients, args.ids, args.ids)
+                    rps = await run_clients(
+                        client, path, args.clients, args.requests, args.ids
+                    )
+                print(f"/{path:9} L1={'on ' if local else 'off'} {mode:6} rps={rps:8.0f}")
+
+
+async def bench_url(args):
+    limits = httpx.Limits(max_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        for path in ("users", "products"):
+            await run_clients(client, path, args.clients, args.ids, args.ids)
+            rps = await run_clients(client, path, args.clients, args.requests, args.ids)
+            print(f"/{path:9} rps={rps:8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="адрес запущенного приложения")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--ids", type=int, default=100)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(bench_url(args) if args.url else bench_in_process(args))
+
+
+if __name__ == "__main__":
+    main()
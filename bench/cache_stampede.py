@@ -0,0 +1,64 @@
+"""Лавина промахов: 1000 параллельных читателей одного продукта в момент
+истечения ключа product:{id}.
+
+Запуск из корня репозитория:
+    python -m bench.cache_stampede
+
+Для каждого истечения (--expiries) ключ удаляется из fakeredis, и
+--readers клиентов одновременно запрашивают продукт. Заглушка репозитория
+отвечает с задержкой --db-ms и считает запросы к БД. Сравниваются сервис
+без объединения запросов и с SingleFlight; ожидается один запрос к БД на
+истечение во втором случае.
+"""
+
+import argparse
+import asyncio
+import time
+
+from fakeredis.aioredis import FakeRedis
+from LR.app.cache import SingleFlight
+from LR.app.services.product_service import ProductService
+from LR.orm.model import ProductResponse
+
+
+class CountingProductRepository:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.queries = 0
+
+    async def get_by_id(self, product_id: int):
+        self.queries += 1
+        await asyncio.sleep(self.latency)
+        return ProductResponse(id=product_id, product_name="hot", quantity=1)
+
+
+async def run(flight: SingleFlight | None, args) -> tuple[int, float]:
+    redis = FakeRedis(decode_responses=True, max_connections=args.readers * 2)
+    repo = CountingProductRepository(args.db_ms / 1000)
+    service = ProductService(repo, redis, flight=flight)
+    start = time.perf_counter()
+    for _ in range(args.expiries):
+        await redis.delete("product:1")  # ключ истёк
+        await asyncio.gather(*(service.get_json_by_id(1) for _ in range(args.readers)))
+    return repo.queries, time.perf_counter() - start
+
+
+async def bench(args):
+    for name, flight in (("plain", None), ("single", SingleFlight())):
+        queries, elapsed = await run(flight, args)
+        print(
+            f"{name:7} db queries={queries:6} "
+            f"per expiry={queries / args.expiries:7.1f}  time={elapsed:6.2f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=1000)
+    parser.add_argument("--expiries", type=int, default=5)
+    parser.add_argument("--db-ms", type=float, default=5, help="задержка БД, мс")
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
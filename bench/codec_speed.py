@@ -0,0 +1,43 @@
+"""Кодирование и разбор сообщений о заказе разными кодеками.
+
+Запуск из корня репозитория:
+    python -m bench.codec_speed
+
+Для заказов на 1, 10, 100 и 1000 позиций выводит размер тела и время
+encode/decode в микросекундах для каждого доступного кодека
+(msgpack - если установлен).
+"""
+
+import timeit
+
+from LR.app.codec import codecs
+
+SIZES = (1, 10, 100, 1000)
+
+
+def order_message(size: int) -> dict:
+    return {
+        "action": "create",
+        "user_id": 3,
+        "address_id": None,
+        "items": [{"product_id": i, "quantity": 2} for i in range(1, size + 1)],
+    }
+
+
+def main():
+    print(f"{'lines':>6} {'codec':>28} {'bytes':>7} {'encode us':>10} {'decode us':>10}")
+    for size in SIZES:
+        message = order_message(size)
+        number = max(10, 20000 // size)
+        for content_type, codec in codecs.items():
+            body = codec.encode(message)
+            encode = timeit.timeit(lambda: codec.encode(message), number=number)
+            decode = timeit.timeit(lambda: codec.decode(body), number=number)
+            print(
+                f"{size:>6} {content_type:>28} {len(body):>7} "
+                f"{encode / number * 1e6:>10.1f} {decode / number * 1e6:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
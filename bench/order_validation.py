@@ -0,0 +1,92 @@
+"""Проверка заказа: запрос на каждую позицию против одного запроса get_many.
+
+Запуск из корня репозитория:
+    python -m bench.order_validation
+    DATABASE_URL=postgresql+asyncpg://... python -m bench.order_validation
+
+По умолчанию используется SQLite в памяти. Для каждого размера заказа
+(1, 10, 100, 1000 позиций) выводится число SQL-запросов и время проверки.
+"""
+
+import asyncio
+import os
+import time
+
+from LR.app.repositories.order_repository import OrderRepository
+from LR.app.repositories.product_repository import ProductRepository
+from LR.app.repositories.user_repository import UserRepository
+from LR.app.services.order_service import OrderService
+from LR.orm.db import Base, Product, User
+from LR.orm.model import OrderCreate
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+SIZES = (1, 10, 100, 1000)
+REPEAT = 20
+
+
+async def check_per_item(service: OrderService, order_data: OrderCreate):
+    """Старый вариант: пользователь и каждый товар отдельным запросом"""
+    user = await service.user_repository.get_by_id(order_data.user_id)
+    if not user:
+        raise ValueError("User not found")
+    for item in order_data.items:
+        product = await service.product_repository.get_by_id(item.product_id)
+        if not product or product.quantity < item.quantity:
+            raise ValueError(f"Product {item.product_id} rejected")
+
+
+async def check_batched(service: OrderService, order_data: OrderCreate):
+    user = await service.user_repository.get_by_id(order_data.user_id)
+    if not user:
+        raise ValueError("User not found")
+    await service._check_stock(order_data.items)  # pylint: disable=protected-access
+
+
+async def main():
+    engine = create_async_engine(DATABASE_URL)
+    queries = 0
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_query(*_):
+        nonlocal queries
+        queries += 1
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        session.add(User(username="bench", email="bench@example.com"))
+        session.add_all(
+            Product(product_name=f"bench{i}", quantity=10**6)
+            for i in range(max(SIZES))
+        )
+        await session.commit()
+
+        service = OrderService(
+            OrderRepository(session), UserRepository(session), ProductRepository(session)
+        )
+
+        print(f"{'lines':>6} {'mode':>9} {'queries':>8} {'ms/order':>9}")
+        for size in SIZES:
+            order_data = OrderCreate(
+                user_id=1,
+                items=[{"product_id": i + 1, "quantity": 1} for i in range(size)],
+            )
+            for name, check in (("per-item", check_per_item), ("batched", check_batched)):
+                queries = 0
+                start = time.perf_counter()
+                for _ in range(REPEAT):
+                    await check(service, order_data)
+                elapsed = (time.perf_counter() - start) / REPEAT * 1000
+                print(f"{size:>6} {name:>9} {queries // REPEAT:>8} {elapsed:>9.2f}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""Загрузка каталога: ProductService.create на каждую строку против
+пакетной загрузки (как POST /products/bulk), строк в секунду.
+
+Запуск из корня репозитория:
+    python -m bench.product_bulk --rows 20000
+    DATABASE_URL=postgresql+asyncpg://... python -m bench.product_bulk
+
+HTTP и Redis не участвуют (кэш - fakeredis): сравнивается работа с БД -
+вставка и COMMIT на строку против одного многострочного
+INSERT ... ON CONFLICT ... RETURNING на пачку.
+Построчный режим меряется на первых --single строк, он намного медленнее.
+По умолчанию используется файл SQLite bench_bulk.db.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from fakeredis.aioredis import FakeRedis
+from LR.app.database import create_engine, create_session_factory
+from LR.app.repositories.product_repository import ProductRepository
+from LR.app.services.product_service import ProductService
+from LR.orm.db import Base
+from LR.orm.model import ProductCreate
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./bench_bulk.db")
+
+
+async def rows(prefix: str, count: int):
+    for i in range(count):
+        yield {"product_name": f"{prefix}-{i}", "quantity": i % 100}
+
+
+async def main(args):
+    engine = create_engine(DATABASE_URL)
+    session_factory = create_session_factory(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    redis = FakeRedis(decode_responses=True)
+
+    async with session_factory() as session:
+        service = ProductService(ProductRepository(session), redis)
+        start = time.perf_counter()
+        async for row in rows("single", args.single):
+            await service.create(ProductCreate(**row))
+        single = args.single / (time.perf_counter() - start)
+
+    async with session_factory() as session:
+        service = ProductService(ProductRepository(session), redis)
+        start = time.perf_counter()
+        await service.bulk_upsert(rows("bulk", args.rows), chunk_size=args.chunk)
+        bulk = args.rows / (time.perf_counter() - start)
+
+        # повторная загрузка того же каталога: все названия заняты
+        start = time.perf_counter()
+        await service.bulk_upsert(
+            rows("bulk", args.rows), update=True, chunk_size=args.chunk
+        )
+        upsert = args.rows / (time.perf_counter() - start)
+
+    print(f"rows={args.rows} chunk={args.chunk}")
+    print(f"create per row:  {single:>9.0f} rows/s")
+    print(f"bulk insert:     {bulk:>9.0f} rows/s")
+    print(f"bulk update:     {upsert:>9.0f} rows/s")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--single", type=int, default=2000)
+    parser.add_argument("--chunk", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""Регистрация пользователей: проверка email отдельным SELECT и INSERT
+против одного INSERT ... ON CONFLICT DO NOTHING RETURNING (как
+UserService.create), регистраций в секунду.
+
+Запуск из корня репозитория:
+    python -m bench.user_signup --users 2000
+    DATABASE_URL=postgresql+asyncpg://... python -m bench.user_signup
+
+HTTP и Redis не участвуют (кэш - fakeredis): сравнивается работа с БД.
+Каждый режим прогоняется дважды: новые email и повторные (все заняты).
+По умолчанию используется файл SQLite bench_signup.db.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from fakeredis.aioredis import FakeRedis
+from LR.app.database import create_engine, create_session_factory
+from LR.app.repositories.user_repository import UserRepository
+from LR.app.services.user_service import UserService
+from LR.orm.db import Base, User
+from LR.orm.model import UserCreate
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./bench_signup.db")
+
+
+def users(prefix: str, count: int) -> list[UserCreate]:
+    return [
+        UserCreate(
+            username=f"{prefix}{i}", email=f"{prefix}{i}@example.com", description=""
+        )
+        for i in range(count)
+    ]
+
+
+async def two_queries(service: UserService, user_data: UserCreate) -> None:
+    """Прежний путь: SELECT по email, затем INSERT"""
+    repo = service.user_repository
+    if await repo.get_by_filter(email=user_data.email):
+        return
+    user = User(
+        username=user_data.username,
+        email=user_data.email,
+        description=user_data.description or "",
+    )
+    repo.session.add(user)
+    await repo.session.commit()
+    await repo.session.refresh(user)
+
+
+async def single_query(service: UserService, user_data: UserCreate) -> None:
+    try:
+        await service.create(user_data)
+    except ValueError:
+        pass
+
+
+async def run(session_factory, redis, signup, batch: list[UserCreate]) -> float:
+    """Сессия на каждую регистрацию, как на каждый запрос в приложении"""
+    start = time.perf_counter()
+    for user_data in batch:
+        async with session_factory() as session:
+            await signup(UserService(UserRepository(session), redis), user_data)
+    return len(batch) / (time.perf_counter() - start)
+
+
+async def main(args):
+    engine = create_engine(DATABASE_URL)
+    session_factory = create_session_factory(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    redis = FakeRedis(decode_responses=True)
+
+    print(f"users={args.users}")
+    modes = (("select+insert", "two", two_queries), ("insert", "one", single_query))
+    for name, prefix, signup in modes:
+        batch = users(prefix, args.users)
+        new = await run(session_factory, redis, signup, batch)
+        taken = await run(session_factory, redis, signup, batch)
+        print(f"{name:<14} new: {new:>7.0f}/s  taken: {taken:>7.0f}/s")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
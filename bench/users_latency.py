@@ -0,0 +1,121 @@
+"""Латентность /users/{id} под 500 параллельными клиентами.
+
+Запуск из корня репозитория:
+    python -m bench.users_latency                    # in-process, до/после
+    python -m bench.users_latency --url http://localhost:8000
+
+In-process режим поднимает UserController с заглушкой репозитория и
+фейковым Redis с задержкой сети (--rtt). Режим "blocking" повторяет старое
+поведение синхронного redis.Redis (time.sleep внутри event loop),
+режим "async" - пул redis.asyncio (await asyncio.sleep). Redis - fakeredis
+(для Lua-скриптов заполнения кэша нужен lupa из requirements-test.txt).
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+import httpx
+from fakeredis.aioredis import FakeRedis
+from litestar import Litestar
+from litestar.di import Provide
+from LR.app.controllers.user_controller import UserController
+from LR.app.services.user_service import UserService
+from LR.orm.model import UserResponse
+
+
+class DelayedRedis(FakeRedis):
+    """fakeredis с задержкой сети на каждую команду (и на Lua-скрипты)"""
+
+    def __init__(self, rtt: float, blocking: bool, **kwargs):
+        super().__init__(decode_responses=True, **kwargs)
+        self.rtt = rtt
+        self.blocking = blocking
+
+    async def execute_command(self, *args, **options):
+        if self.blocking:
+            time.sleep(self.rtt)  # так вёл себя синхронный клиент
+        else:
+            await asyncio.sleep(self.rtt)
+        return await super().execute_command(*args, **options)
+
+
+class StubUserRepository:
+    async def get_by_id(self, user_id: int):
+        return UserResponse(
+            id=user_id, username=f"user{user_id}", email=f"{user_id}@x", description=""
+        )
+
+
+def build_app(redis) -> Litestar:
+    service = UserService(StubUserRepository(), redis)
+    return Litestar(
+        route_handlers=[UserController],
+        dependencies={"user_service": Provide(lambda: service, sync_to_thread=False)},
+    )
+
+
+async def run_clients(client, clients: int, rounds: int, ids: int) -> list[float]:
+    """Волнами: все клиенты стартуют одновременно, задержка считается от начала
+    волны, иначе блокировка event loop прячет очередь и от замеров клиента"""
+    latencies: list[float] = []
+
+    async def worker(n: int, started: float):
+        response = await client.get(f"/users/{n % ids + 1}")
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n, started) for n in range(clients)))
+    return latencies
+
+
+def report(name: str, latencies: list[float], elapsed: float):
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    rps = len(latencies) / elapsed
+    print(f"{name:10} p50={p50:8.2f}ms  p99={p99:8.2f}ms  rps={rps:8.0f}")
+
+
+async def bench_in_process(args):
+    for mode in ("blocking", "async"):
+        app = build_app(
+            DelayedRedis(
+                args.rtt,
+                blocking=mode == "blocking",
+                max_connections=args.clients * 2,
+            )
+        )
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://b") as c:
+            start = time.perf_counter()
+            latencies = await run_clients(c, args.clients, args.rounds, args.ids)
+            report(mode, latencies, time.perf_counter() - start)
+
+
+async def bench_url(args):
+    limits = httpx.Limits(max_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        start = time.perf_counter()
+        latencies = await run_clients(client, args.clients, args.rounds, args.ids)
+        report("server", latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", help="адрес запущенного приложения")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--ids", type=int, default=100)
+    parser.add_argument("--rtt", type=float, default=0.001, help="задержка Redis, с")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(bench_url(args) if args.url else bench_in_process(args))
+
+
+if __name__ == "__main__":
+    main()
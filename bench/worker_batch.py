@@ -0,0 +1,69 @@
+"""Запись сообщений очереди: COMMIT на каждое против пачки в одной транзакции.
+
+Запуск из корня репозитория:
+    python -m bench.worker_batch --messages 5000 --batch 100
+    DATABASE_URL=postgresql+asyncpg://... python -m bench.worker_batch
+
+RabbitMQ не нужен: сообщения о создании продуктов подаются напрямую в
+обработку, как это делает rabbit_worker.py в обычном и пакетном режимах.
+По умолчанию используется файл SQLite bench_worker.db.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from LR.app.batching import MessageBatcher, apply_batch
+from LR.app.database import create_engine, create_session_factory
+from LR.app.repositories.product_repository import ProductRepository
+from LR.orm.db import Base
+from LR.orm.model import ProductCreate
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./bench_worker.db")
+
+
+async def apply_product(session, product: dict):
+    await ProductRepository(session).create(ProductCreate(**product))
+
+
+async def main(args):
+    engine = create_engine(DATABASE_URL)
+    session_factory = create_session_factory(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    def messages(mode):
+        return [
+            {"product_name": f"{mode}-{i}", "quantity": 1}
+            for i in range(args.messages)
+        ]
+
+    start = time.perf_counter()
+    for product in messages("single"):
+        async with session_factory() as session:
+            await apply_product(session, product)
+    single = args.messages / (time.perf_counter() - start)
+
+    batcher = MessageBatcher(
+        lambda batch: apply_batch(engine, batch, apply_product),
+        max_size=args.batch,
+    )
+    start = time.perf_counter()
+    for product in messages("batch"):
+        await batcher.add(product)
+    await batcher.flush()
+    batched = args.messages / (time.perf_counter() - start)
+
+    print(f"messages={args.messages} batch={args.batch}")
+    print(f"per-message commit: {single:>8.0f} msg/s")
+    print(f"batched commit:     {batched:>8.0f} msg/s ({batched / single:.1f}x)")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -1,36 +1,29 @@
-import pika
-import json, random
-
-def send_message_order(user_id: int, items: list[dict]):
-    # подключение
-    credentials = pika.PlainCredentials("admin", "admin")
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters(
-            host="rabbitmq",
-            port=5672,
-            virtual_host="local",
-            credentials=credentials
-        )
-    )
-    channel = connection.channel()
-
-    # сообщение
-    message = {
+import asyncio
+import os
+
+from LR.app.codec import JSON
+from publisher import Publisher
+
+# формат сообщений: application/json, application/msgpack
+# или application/x-order-create (фиксированная схема)
+ORDER_CONTENT_TYPE = os.getenv("ORDER_CONTENT_TYPE", JSON)
+
+
+def order_message(user_id: int, items: list[dict]) -> dict:
+    return {
         "action": "create",
         "user_id": user_id,
         "address_id": None,
         "items": items
     }
 
-    # отправка
-    channel.basic_publish(
-        exchange='',
-        routing_key="order",
-        body=json.dumps(message)
-    )
-    connection.close()
 
-if __name__ == "__main__":
+async def send_message_order(publisher: Publisher, user_id: int, items: list[dict]):
+    # соединение и канал берутся из пула публикатора
+    await publisher.send("order", order_message(user_id, items), ORDER_CONTENT_TYPE)
+
+
+async def main():
     order1 = {
         "user_id": 3,
         "items": [
@@ -39,4 +32,8 @@ if __name__ == "__main__":
             {"product_id": 5, "quantity": 3}
         ]
     }
-    send_message_order(user_id=order1["user_id"], items=order1["items"])
+    async with Publisher() as publisher:
+        await send_message_order(publisher, user_id=order1["user_id"], items=order1["items"])
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,36 +1,32 @@
-import pika
-import json, random
-
-def send_message_product(product_name: str, quantity: int):
-    # подключение
-    credentials = pika.PlainCredentials("admin", "admin")
-    connection = pika.BlockingConnection(
-        pika.ConnectionParameters(
-            host="rabbitmq",
-            port=5672,
-            virtual_host="local",
-            credentials=credentials
-        )
-    )
-    channel = connection.channel()
-
-    # сообщение
-    message = {
+import asyncio
+import os
+import random
+
+from LR.app.codec import JSON
+from publisher import Publisher
+
+# формат сообщений: application/json или application/msgpack
+PRODUCT_CONTENT_TYPE = os.getenv("PRODUCT_CONTENT_TYPE", JSON)
+
+
+def product_message(product_name: str, quantity: int) -> dict:
+    return {
         "action": "create",
         "product_name": product_name,
         "quantity": quantity
     }
 
-    # отправка
-    channel.basic_publish(
-        exchange='',
-        routing_key="product",
-        body=json.dumps(message)
-    )
-    connection.close()
+
+async def send_message_product(publisher: Publisher, product_name: str, quantity: int):
+    # соединение и канал берутся из пула публикатора
+    await publisher.send("product", product_message(product_name, quantity), PRODUCT_CONTENT_TYPE)
+
+
+async def main():
+    messages = [product_message(f"Product{i+1}", random.randint(1, 8)) for i in range(5)]
+    async with Publisher() as publisher:
+        # одной пачкой с общим ожиданием подтверждений
+        await publisher.send_many("product", messages, PRODUCT_CONTENT_TYPE)
 
 if __name__ == "__main__":
-    for i in range(5):
-        str0 = f"Product{i+1}"
-        q = random.randint(1, 8) 
-        send_message_product(str0, q)
+    asyncio.run(main())